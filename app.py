@@ -1,18 +1,23 @@
 """
 Main Flask application for Healthcare Insurance API.
 """
-from flask import Flask, jsonify
+from flask import Flask
 from flask_cors import CORS
 from config import Config
+from services.supabase_client import SupabaseClient
 from routes.auth import auth_bp
 from routes.users import users_bp
 from routes.policies import policies_bp
 from routes.claims import claims_bp
+from utils.serialization import OrjsonProvider, raw_json_response, to_json
 
 # Initialize Flask app
 app = Flask(__name__)
 app.config['SECRET_KEY'] = Config.SECRET_KEY
 
+# Serialize JSON responses with orjson
+app.json = OrjsonProvider(app)
+
 # Enable CORS
 CORS(app)
 
@@ -23,26 +28,32 @@ app.register_blueprint(policies_bp)
 app.register_blueprint(claims_bp)
 
 
+# Constant response bodies, serialized once at startup
+_HEALTH_BODY = to_json({
+    'message': 'Healthcare Insurance API is running',
+    'version': '1.0.0',
+    'status': 'healthy'
+})
+_NOT_FOUND_BODY = to_json({'error': 'Endpoint not found'})
+_INTERNAL_ERROR_BODY = to_json({'error': 'Internal server error'})
+
+
 @app.route('/', methods=['GET'])
 def health_check():
     """Health check endpoint."""
-    return jsonify({
-        'message': 'Healthcare Insurance API is running',
-        'version': '1.0.0',
-        'status': 'healthy'
-    }), 200
+    return raw_json_response(_HEALTH_BODY, 200)
 
 
 @app.errorhandler(404)
 def not_found(error):
     """Handle 404 errors."""
-    return jsonify({'error': 'Endpoint not found'}), 404
+    return raw_json_response(_NOT_FOUND_BODY, 404)
 
 
 @app.errorhandler(500)
 def internal_error(error):
     """Handle 500 errors."""
-    return jsonify({'error': 'Internal server error'}), 500
+    return raw_json_response(_INTERNAL_ERROR_BODY, 500)
 
 
 if __name__ == '__main__':
@@ -54,6 +65,10 @@ if __name__ == '__main__':
         print("Please check your .env file and ensure all required variables are set.")
         exit(1)
     
+    # Connect to Supabase before serving the first request
+    if not SupabaseClient.warm_up():
+        print("Warning: could not reach Supabase; connecting on first request instead.")
+    
     # Run the application
     app.run(debug=Config.FLASK_ENV == 'development', host='0.0.0.0', port=5000)
 
@@ -17,20 +17,37 @@ class Config:
     # Supabase settings
     SUPABASE_URL = os.getenv('SUPABASE_URL')
     SUPABASE_KEY = os.getenv('SUPABASE_KEY')
+    SUPABASE_TIMEOUT = 10.0
+    SUPABASE_CONNECT_TIMEOUT = 3.0
+    SUPABASE_MAX_CONNECTIONS = 200
+    SUPABASE_MAX_KEEPALIVE_CONNECTIONS = 100
+    SUPABASE_KEEPALIVE_EXPIRY = 60.0
     
     # JWT settings
     JWT_SECRET_KEY = os.getenv('JWT_SECRET_KEY', 'dev-secret-key-change-in-production')
     JWT_ALGORITHM = 'HS256'
     JWT_EXPIRATION_HOURS = 24
     
-    # Password hashing
-    BCRYPT_ROUNDS = 12
+    # Password hashing (argon2id; legacy bcrypt hashes are upgraded on login)
+    ARGON2_TIME_COST = 2
+    ARGON2_MEMORY_COST = 46 * 1024  # KiB
+    ARGON2_PARALLELISM = 1
+    PASSWORD_HASH_WORKERS = 4
     
-    @staticmethod
-    def validate():
-        """Validate that required environment variables are set."""
+    _validated = False
+    
+    @classmethod
+    def validate(cls):
+        """
+        Validate that required environment variables are set.
+        
+        The check only runs until it first succeeds; later calls return immediately.
+        """
+        if cls._validated:
+            return
         required_vars = ['SUPABASE_URL', 'SUPABASE_KEY', 'JWT_SECRET_KEY']
         missing = [var for var in required_vars if not os.getenv(var)]
         if missing:
             raise ValueError(f"Missing required environment variables: {', '.join(missing)}")
+        cls._validated = True
 
@@ -1,5 +1,6 @@
 -- Healthcare Insurance Management API - Database Schema
--- Run this SQL in your Supabase SQL Editor
+-- Run this SQL in your Supabase SQL Editor. It is safe to re-run on an existing
+-- database to pick up new functions.
 
 -- Users table with role-based access
 CREATE TABLE IF NOT EXISTS users (
@@ -69,10 +70,65 @@ BEGIN
 END;
 $$ language 'plpgsql';
 
--- Triggers to automatically update updated_at
+-- Triggers to automatically update updated_at (dropped first so the script can be re-run)
+DROP TRIGGER IF EXISTS update_users_updated_at ON users;
 CREATE TRIGGER update_users_updated_at BEFORE UPDATE ON users
     FOR EACH ROW EXECUTE FUNCTION update_updated_at_column();
 
+DROP TRIGGER IF EXISTS update_policies_updated_at ON policies;
 CREATE TRIGGER update_policies_updated_at BEFORE UPDATE ON policies
     FOR EACH ROW EXECUTE FUNCTION update_updated_at_column();
 
+-- Aggregated policy statistics by payer program (used by GET /api/policies/programs)
+CREATE OR REPLACE FUNCTION get_payer_program_stats()
+RETURNS TABLE (
+    payer_program TEXT,
+    count BIGINT,
+    active BIGINT,
+    total_coverage NUMERIC,
+    total_premiums NUMERIC
+) AS $$
+    SELECT
+        p.payer_program::TEXT,
+        COUNT(*),
+        COUNT(*) FILTER (WHERE p.status = 'active'),
+        COALESCE(SUM(p.coverage_amount), 0),
+        COALESCE(SUM(p.premium_amount), 0)
+    FROM policies p
+    GROUP BY p.payer_program;
+$$ LANGUAGE sql STABLE;
+
+-- Review a claim in one statement (used by POST /api/claims/<id>/review).
+-- The approved amount is checked against the claim amount in the same UPDATE,
+-- so concurrent reviews cannot slip past the check.
+CREATE OR REPLACE FUNCTION review_claim_fn(
+    p_claim_id BIGINT,
+    p_status TEXT,
+    p_approved_amount NUMERIC,
+    p_reviewer_id BIGINT,
+    p_notes TEXT
+)
+RETURNS SETOF claims AS $$
+DECLARE
+    reviewed claims;
+BEGIN
+    UPDATE claims
+    SET status = p_status,
+        approved_amount = p_approved_amount,
+        reviewed_by = p_reviewer_id,
+        reviewed_at = NOW(),
+        review_notes = p_notes
+    WHERE id = p_claim_id
+      AND p_approved_amount <= claim_amount
+    RETURNING * INTO reviewed;
+
+    IF NOT FOUND THEN
+        IF NOT EXISTS (SELECT 1 FROM claims WHERE id = p_claim_id) THEN
+            RAISE EXCEPTION 'Claim not found' USING ERRCODE = 'P0002';
+        END IF;
+        RAISE EXCEPTION 'Approved amount cannot exceed claim amount' USING ERRCODE = 'P0001';
+    END IF;
+
+    RETURN NEXT reviewed;
+END;
+$$ LANGUAGE plpgsql;
@@ -1,9 +1,8 @@
 """
-Helper script to generate bcrypt password hashes for testing.
+Helper script to generate argon2id password hashes for testing.
 Usage: python generate_password_hash.py
 """
-import bcrypt
-from config import Config
+from services.auth_service import AuthService
 
 if __name__ == '__main__':
     print("Password Hash Generator")
@@ -15,14 +14,12 @@ if __name__ == '__main__':
         print("Password cannot be empty!")
         exit(1)
     
-    # Generate hash with same rounds as configured
-    salt = bcrypt.gensalt(rounds=Config.BCRYPT_ROUNDS)
-    hashed = bcrypt.hashpw(password.encode('utf-8'), salt)
+    # Generate hash with the same parameters the API uses
+    hashed = AuthService.hash_password(password)
     
     print("\nGenerated hash:")
-    print(hashed.decode('utf-8'))
+    print(hashed)
     print("\nYou can use this hash in SQL INSERT statements for testing.")
     print("\nExample SQL:")
     print(f"INSERT INTO users (email, password_hash, full_name, role) VALUES")
-    print(f"('test@example.com', '{hashed.decode('utf-8')}', 'Test User', 'patient');")
-
+    print(f"('test@example.com', '{hashed}', 'Test User', 'patient');")
@@ -0,0 +1,15 @@
+"""
+Gunicorn configuration for the Healthcare Insurance API.
+"""
+import multiprocessing
+import os
+
+bind = os.getenv('GUNICORN_BIND', '0.0.0.0:5000')
+
+# Cooperative workers so Supabase I/O from concurrent requests overlaps
+worker_class = 'gevent'
+workers = int(os.getenv('GUNICORN_WORKERS', multiprocessing.cpu_count() * 2 + 1))
+worker_connections = int(os.getenv('GUNICORN_WORKER_CONNECTIONS', 1000))
+
+timeout = 30
+keepalive = 5
@@ -1,13 +1,31 @@
 """
 Authentication routes for user registration and login.
 """
-from flask import Blueprint, request, jsonify
+import re
+from flask import Blueprint, jsonify
 from services.user_service import UserService
 from services.auth_service import AuthService
-from utils.helpers import require_auth
+from utils.helpers import require_auth, require_role, get_json_body, get_required_json_body
+from utils.serialization import raw_json_response, to_json
 
 auth_bp = Blueprint('auth', __name__, url_prefix='/api/auth')
 
+# Fields required to register, in the order they are reported as missing
+_REGISTER_REQUIRED_FIELDS = ('email', 'password', 'full_name', 'role')
+_REGISTER_REQUIRED = frozenset(_REGISTER_REQUIRED_FIELDS)
+
+# Classifiers for errors raised while creating a user
+_DUPLICATE_RE = re.compile(r'duplicate|unique', re.IGNORECASE)
+_API_KEY_RE = re.compile(r'api key|invalid', re.IGNORECASE)
+
+# Largest number of users accepted by one bulk registration request (each one
+# costs a memory-hard password hash)
+_MAX_BULK_REGISTER = 25
+
+# Login failure bodies, serialized once (these paths absorb brute-force traffic)
+_INVALID_CREDENTIALS_BODY = to_json({'error': 'Invalid email or password'})
+_DEACTIVATED_BODY = to_json({'error': 'User account is deactivated'})
+
 
 @auth_bp.route('/register', methods=['POST'])
 def register():
@@ -26,13 +44,13 @@ def register():
         }
     """
     try:
-        data = request.get_json()
+        data = get_required_json_body()
         
-        # Validate required fields
-        required_fields = ['email', 'password', 'full_name', 'role']
-        for field in required_fields:
-            if field not in data:
-                return jsonify({'error': f'{field} is required'}), 400
+        # Validate required fields (a body that is not an object has none)
+        present = data.keys() if isinstance(data, dict) else frozenset()
+        if not _REGISTER_REQUIRED <= present:
+            field = next(f for f in _REGISTER_REQUIRED_FIELDS if f not in present)
+            return jsonify({'error': f'{field} is required'}), 400
         
         # Create user
         user = UserService.create_user(data)
@@ -45,17 +63,79 @@ def register():
     except ValueError as e:
         return jsonify({'error': str(e)}), 400
     except Exception as e:
-        error_str = str(e)
-        # Check if it's a unique constraint violation
-        if 'duplicate' in error_str.lower() or 'unique' in error_str.lower():
-            return jsonify({'error': 'Email already exists'}), 400
-        # Check for Supabase API key errors
-        if 'api key' in error_str.lower() or 'invalid' in error_str.lower():
-            return jsonify({
-                'error': f'Registration failed: {error_str}',
-                'hint': 'Please verify your SUPABASE_URL and SUPABASE_KEY in .env file are correct and restart the Flask app.'
-            }), 500
-        return jsonify({'error': f'Registration failed: {error_str}'}), 500
+        return _registration_error(e)
+
+
+@auth_bp.route('/register_bulk', methods=['POST'])
+@require_auth
+@require_role(['administrator'])
+def register_bulk(current_user):
+    """
+    Register several users in one request (single database insert).
+    
+    The batch is all-or-nothing: if any user is invalid or already exists,
+    no users are created.
+    
+    Requires: Administrator role
+    
+    Request body:
+        {
+            "users": [
+                {
+                    "email": "user@example.com",
+                    "password": "password123",
+                    "full_name": "John Doe",
+                    "role": "patient"
+                },
+                ...
+            ]
+        }
+    """
+    try:
+        data = get_required_json_body()
+        
+        users = data.get('users') if isinstance(data, dict) else None
+        if not isinstance(users, list) or not users:
+            return jsonify({'error': 'users must be a non-empty list'}), 400
+        if len(users) > _MAX_BULK_REGISTER:
+            return jsonify({'error': f'At most {_MAX_BULK_REGISTER} users can be registered at once'}), 400
+        
+        # Validate required fields
+        for index, user_data in enumerate(users, start=1):
+            if not isinstance(user_data, dict):
+                return jsonify({'error': f'User {index}: must be an object'}), 400
+            if not _REGISTER_REQUIRED <= user_data.keys():
+                field = next(f for f in _REGISTER_REQUIRED_FIELDS if f not in user_data)
+                return jsonify({'error': f'User {index}: {field} is required'}), 400
+        
+        # Create users
+        created = UserService.create_users(users)
+        
+        return jsonify({
+            'message': 'Users registered successfully',
+            'users': created,
+            'count': len(created)
+        }), 201
+    
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return _registration_error(e)
+
+
+def _registration_error(e: Exception):
+    """Build the error response for a failed registration."""
+    error_str = str(e)
+    # Check if it's a unique constraint violation
+    if _DUPLICATE_RE.search(error_str):
+        return jsonify({'error': 'Email already exists'}), 400
+    # Check for Supabase API key errors
+    if _API_KEY_RE.search(error_str):
+        return jsonify({
+            'error': f'Registration failed: {error_str}',
+            'hint': 'Please verify your SUPABASE_URL and SUPABASE_KEY in .env file are correct and restart the Flask app.'
+        }), 500
+    return jsonify({'error': f'Registration failed: {error_str}'}), 500
 
 
 @auth_bp.route('/login', methods=['POST'])
@@ -70,7 +150,7 @@ def login():
         }
     """
     try:
-        data = request.get_json()
+        data = get_json_body()
         
         if not data or 'email' not in data or 'password' not in data:
             return jsonify({'error': 'Email and password are required'}), 400
@@ -82,15 +162,22 @@ def login():
         user = UserService.get_user_by_email(email)
         
         if not user:
-            return jsonify({'error': 'Invalid email or password'}), 401
+            return raw_json_response(_INVALID_CREDENTIALS_BODY, 401)
         
         # Check if user is active
         if not user.get('is_active', True):
-            return jsonify({'error': 'User account is deactivated'}), 403
+            return raw_json_response(_DEACTIVATED_BODY, 403)
         
         # Verify password
         if not AuthService.verify_password(password, user['password_hash']):
-            return jsonify({'error': 'Invalid email or password'}), 401
+            return raw_json_response(_INVALID_CREDENTIALS_BODY, 401)
+        
+        # Upgrade legacy bcrypt hashes to argon2id now that we have the password
+        if AuthService.needs_rehash(user['password_hash']):
+            try:
+                UserService.update_password_hash(user['id'], AuthService.hash_password(password))
+            except Exception:
+                pass  # Best effort; the old hash still verifies
         
         # Generate JWT token
         token = AuthService.generate_token(
@@ -108,6 +195,8 @@ def login():
             'user': user
         }), 200
     
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': f'Login failed: {str(e)}'}), 500
 
@@ -1,12 +1,16 @@
 """
 Claims processing routes.
 """
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, jsonify
 from services.claim_service import ClaimService
-from utils.helpers import require_auth, require_role
+from utils.serialization import stream_list_response
+from utils.helpers import require_auth, require_role, get_json_body, get_required_json_body, get_bulk_json_items, get_pagination_args
 
 claims_bp = Blueprint('claims', __name__, url_prefix='/api/claims')
 
+# Largest number of claims accepted by one bulk request
+_MAX_BULK_CLAIMS = 100
+
 
 @claims_bp.route('', methods=['POST'])
 @require_auth
@@ -29,10 +33,7 @@ def submit_claim(current_user):
         }
     """
     try:
-        data = request.get_json()
-        
-        if not data:
-            return jsonify({'error': 'No data provided'}), 400
+        data = get_required_json_body()
         
         claim = ClaimService.create_claim(data, current_user['id'])
         
@@ -49,6 +50,44 @@ def submit_claim(current_user):
         return jsonify({'error': f'Failed to submit claim: {str(e)}'}), 500
 
 
+@claims_bp.route('/bulk', methods=['POST'])
+@require_auth
+def submit_claims_bulk(current_user):
+    """
+    Submit several claims in one request.
+    
+    Claims are checked like single submissions (own, active policies only)
+    and inserted with a single database write; if any claim is rejected,
+    none are created.
+    
+    Requires: Authorization header with Bearer token
+    
+    Request body:
+        {
+            "claims": [
+                { ...same fields as POST /api/claims... },
+                ...
+            ]
+        }
+    """
+    try:
+        claims = get_bulk_json_items('claims', 'claim', _MAX_BULK_CLAIMS, 'submitted')
+        created = ClaimService.submit_claims(claims, current_user['id'])
+        
+        return jsonify({
+            'message': 'Claims submitted successfully',
+            'claims': created,
+            'count': len(created)
+        }), 201
+    
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except PermissionError as e:
+        return jsonify({'error': str(e)}), 403
+    except Exception as e:
+        return jsonify({'error': f'Failed to submit claims: {str(e)}'}), 500
+
+
 @claims_bp.route('', methods=['GET'])
 @require_auth
 def get_claims(current_user):
@@ -56,21 +95,26 @@ def get_claims(current_user):
     Get claims (filtered by role).
     
     Patients see only their own claims.
-    Providers/Admins see all claims.
+    Providers/Admins see all claims, one page at a time.
+    
+    Query parameters (providers/admins):
+        - limit: Page size (default 100, max 1000)
+        - offset: Number of claims to skip
+        - after_id: Return claims after this claim ID (use the last ID of the previous page)
     
     Requires: Authorization header with Bearer token
     """
     try:
         if current_user['role'] == 'patient':
-            claims = ClaimService.get_claims_by_user(current_user['id'])
+            claims = ClaimService.get_claims_with_policy(current_user['id'])
         else:
-            claims = ClaimService.get_all_claims()
+            limit, offset, after_id = get_pagination_args()
+            claims = ClaimService.get_all_claims(limit=limit, offset=offset, after_id=after_id)
         
-        return jsonify({
-            'claims': claims,
-            'count': len(claims)
-        }), 200
+        return stream_list_response('claims', claims), 200
     
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': f'Failed to fetch claims: {str(e)}'}), 500
 
@@ -127,10 +171,7 @@ def review_claim(claim_id, current_user):
         }
     """
     try:
-        data = request.get_json()
-        
-        if not data:
-            return jsonify({'error': 'No data provided'}), 400
+        data = get_required_json_body()
         
         claim = ClaimService.review_claim(claim_id, data, current_user['id'])
         
@@ -160,7 +201,7 @@ def update_claim_status(claim_id, current_user):
         }
     """
     try:
-        data = request.get_json()
+        data = get_json_body()
         
         if not data or 'status' not in data:
             return jsonify({'error': 'Status is required'}), 400
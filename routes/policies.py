@@ -3,10 +3,17 @@ Policy management routes.
 """
 from flask import Blueprint, request, jsonify
 from services.policy_service import PolicyService
-from utils.helpers import require_auth, require_role
+from utils.serialization import stream_list_response
+from utils.helpers import require_auth, require_role, get_json_body, get_required_json_body, get_bulk_json_items, get_pagination_args
 
 policies_bp = Blueprint('policies', __name__, url_prefix='/api/policies')
 
+_VALID_PROGRAMS = frozenset(('medicare', 'medicaid', 'commercial', 'other_government'))
+_INVALID_PROGRAM_ERROR = 'Invalid payer_program. Must be one of: medicare, medicaid, commercial, other_government'
+
+# Largest number of policies accepted by one bulk request
+_MAX_BULK_POLICIES = 100
+
 
 @policies_bp.route('', methods=['POST'])
 @require_auth
@@ -36,10 +43,7 @@ def create_policy(current_user):
         }
     """
     try:
-        data = request.get_json()
-        
-        if not data:
-            return jsonify({'error': 'No data provided'}), 400
+        data = get_required_json_body()
         
         policy = PolicyService.create_policy(data, current_user['id'])
         
@@ -54,6 +58,42 @@ def create_policy(current_user):
         return jsonify({'error': f'Failed to create policy: {str(e)}'}), 500
 
 
+@policies_bp.route('/bulk', methods=['POST'])
+@require_auth
+@require_role(['administrator', 'provider'])
+def create_policies_bulk(current_user):
+    """
+    Create several policies in one request (admin/provider only).
+    
+    All policies are inserted with a single database write; if any policy
+    is invalid, none are created.
+    
+    Requires: Authorization header with Bearer token
+    
+    Request body:
+        {
+            "policies": [
+                { ...same fields as POST /api/policies... },
+                ...
+            ]
+        }
+    """
+    try:
+        policies = get_bulk_json_items('policies', 'policy', _MAX_BULK_POLICIES, 'created')
+        created = PolicyService.create_policies(policies, current_user['id'])
+        
+        return jsonify({
+            'message': 'Policies created successfully',
+            'policies': created,
+            'count': len(created)
+        }), 201
+    
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': f'Failed to create policies: {str(e)}'}), 500
+
+
 @policies_bp.route('', methods=['GET'])
 @require_auth
 def get_policies(current_user):
@@ -66,6 +106,8 @@ def get_policies(current_user):
     Query parameters:
         - payer_program: Filter by payer program (medicare, medicaid, commercial, other_government)
         - user_id: Filter by user ID (admin/provider only)
+        - limit, offset, after_id: Pagination when listing all policies (default 100
+          per page, max 1000; after_id is the last policy ID of the previous page)
     
     Requires: Authorization header with Bearer token
     """
@@ -81,20 +123,17 @@ def get_policies(current_user):
                 policies = PolicyService.get_policies_by_user(user_id)
             elif payer_program:
                 # Validate payer_program
-                valid_programs = ['medicare', 'medicaid', 'commercial', 'other_government']
-                if payer_program not in valid_programs:
-                    return jsonify({
-                        'error': f'Invalid payer_program. Must be one of: {", ".join(valid_programs)}'
-                    }), 400
+                if payer_program not in _VALID_PROGRAMS:
+                    return jsonify({'error': _INVALID_PROGRAM_ERROR}), 400
                 policies = PolicyService.get_policies_by_payer_program(payer_program)
             else:
-                policies = PolicyService.get_all_policies()
+                limit, offset, after_id = get_pagination_args()
+                policies = PolicyService.get_all_policies(limit=limit, offset=offset, after_id=after_id)
         
-        return jsonify({
-            'policies': policies,
-            'count': len(policies)
-        }), 200
+        return stream_list_response('policies', policies), 200
     
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': f'Failed to fetch policies: {str(e)}'}), 500
 
@@ -174,10 +213,7 @@ def update_policy(policy_id, current_user):
         }
     """
     try:
-        data = request.get_json()
-        
-        if not data:
-            return jsonify({'error': 'No data provided'}), 400
+        data = get_required_json_body()
         
         policy = PolicyService.update_policy(policy_id, data)
         
@@ -209,7 +245,7 @@ def update_policy_status(policy_id, current_user):
     Valid statuses: active, inactive, suspended, cancelled
     """
     try:
-        data = request.get_json()
+        data = get_json_body()
         
         if not data or 'status' not in data:
             return jsonify({'error': 'Status is required'}), 400
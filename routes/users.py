@@ -1,9 +1,10 @@
 """
 User management routes.
 """
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, jsonify
 from services.user_service import UserService
-from utils.helpers import require_auth, require_role
+from utils.serialization import stream_list_response
+from utils.helpers import require_auth, require_role, get_required_json_body
 
 users_bp = Blueprint('users', __name__, url_prefix='/api/users')
 
@@ -19,10 +20,7 @@ def get_all_users(current_user):
     """
     try:
         users = UserService.get_all_users()
-        return jsonify({
-            'users': users,
-            'count': len(users)
-        }), 200
+        return stream_list_response('users', users), 200
     except Exception as e:
         return jsonify({'error': f'Failed to fetch users: {str(e)}'}), 500
 
@@ -76,10 +74,7 @@ def update_user(user_id, current_user):
         }
     """
     try:
-        data = request.get_json()
-        
-        if not data:
-            return jsonify({'error': 'No data provided'}), 400
+        data = get_required_json_body()
         
         user = UserService.update_user(user_id, data, current_user)
         
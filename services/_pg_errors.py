@@ -0,0 +1,55 @@
+"""
+Translation of Supabase/PostgREST errors into application exceptions.
+"""
+import re
+
+# Postgres error codes for constraint violations
+UNIQUE_VIOLATION = '23505'
+FOREIGN_KEY_VIOLATION = '23503'
+
+# Classifiers for common Supabase setup errors
+_API_KEY_ERROR_RE = re.compile(r'api ?key|401|unauthorized|forbidden', re.IGNORECASE)
+_AUTH_ERROR_RE = re.compile(r'JWT|(?i:token)')
+_SCHEMA_ERROR_RE = re.compile(r'relation|does not exist|table', re.IGNORECASE)
+
+_API_KEY_HELP = (
+    "Please verify:\n"
+    "1. SUPABASE_URL format: https://xxx.supabase.co\n"
+    "2. SUPABASE_KEY is the full key (starts with 'eyJ')\n"
+    "3. No quotes or extra spaces in .env\n"
+    "4. Restart Flask after .env changes"
+)
+
+
+def classify(exc: Exception, table: str) -> Exception:
+    """
+    Turn an error raised by a Supabase query into the exception to raise.
+    
+    Configuration problems (bad API key, missing table) become ValueErrors
+    with setup hints; anything else becomes an Exception carrying the
+    original error details for debugging.
+    
+    Args:
+        exc: Exception raised by the Supabase client
+        table: Table the query ran against (used in hints)
+        
+    Returns:
+        Exception: Exception to raise (use `raise classify(e, ...) from e`)
+    """
+    error_msg = str(exc)
+    
+    if _API_KEY_ERROR_RE.search(error_msg):
+        actual_error = str(exc.args[0]) if exc.args else error_msg
+        return ValueError(f"Supabase API key error: {actual_error}. {_API_KEY_HELP}")
+    if _AUTH_ERROR_RE.search(error_msg):
+        return ValueError("Supabase authentication error. Please check your SUPABASE_KEY in .env file.")
+    if _SCHEMA_ERROR_RE.search(error_msg):
+        return ValueError(f"Database table '{table}' does not exist. Please run database_schema.sql in Supabase SQL Editor.")
+    
+    # Include full error details for debugging
+    full_error = f"Supabase error ({type(exc).__name__}): {error_msg}"
+    for attr in ('message', 'code', 'hint'):
+        value = getattr(exc, attr, None)
+        if value is not None:
+            full_error += f" {attr.capitalize()}: {value}"
+    return Exception(full_error)
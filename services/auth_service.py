@@ -1,10 +1,95 @@
 """
 Authentication service for password hashing and JWT token generation.
 """
+import base64
+import hashlib
+import hmac
+import time
 import bcrypt
 import jwt
-from datetime import datetime, timedelta
+from argon2 import PasswordHasher
+from concurrent.futures import ThreadPoolExecutor
 from config import Config
+from utils.serialization import to_json
+
+try:
+    import gevent
+    from gevent import monkey as gevent_monkey
+except ImportError:
+    gevent = None
+
+_ARGON2_PREFIX = '$argon2'
+
+# JWT settings, resolved once at import
+_JWT_SECRET_KEY = Config.JWT_SECRET_KEY
+_JWT_ALGORITHM = Config.JWT_ALGORITHM
+_JWT_EXPIRATION_SECONDS = Config.JWT_EXPIRATION_HOURS * 3600
+
+
+def _b64url(data: bytes) -> bytes:
+    """Base64url-encode without padding, as used by JWS."""
+    return base64.urlsafe_b64encode(data).rstrip(b'=')
+
+
+# HS256 tokens always share the same header, so encode it once
+_HS256_HEADER = _b64url(b'{"alg":"HS256","typ":"JWT"}') + b'.'
+_JWT_SECRET_BYTES = _JWT_SECRET_KEY.encode('utf-8')
+
+
+def _encode_hs256(payload: dict) -> str:
+    """
+    Encode and sign a JWT with HS256.
+    
+    Equivalent to jwt.encode(payload, key, algorithm='HS256') for payloads
+    with integer timestamps, without PyJWT's per-call header building and
+    algorithm lookup.
+    """
+    signing_input = _HS256_HEADER + _b64url(to_json(payload))
+    signature = hmac.new(_JWT_SECRET_BYTES, signing_input, hashlib.sha256).digest()
+    return (signing_input + b'.' + _b64url(signature)).decode('ascii')
+
+
+_password_hasher = PasswordHasher(
+    time_cost=Config.ARGON2_TIME_COST,
+    memory_cost=Config.ARGON2_MEMORY_COST,
+    parallelism=Config.ARGON2_PARALLELISM
+)
+
+# Hashing is CPU-bound native code that releases the GIL, so running it on
+# worker threads lets other requests make progress in the meantime
+_hash_pool = ThreadPoolExecutor(max_workers=Config.PASSWORD_HASH_WORKERS)
+
+
+def _run_in_hash_pool(fn, *args):
+    """
+    Run a password hashing call off the request thread and wait for it.
+    
+    Under gevent, threading is monkey-patched and a ThreadPoolExecutor
+    would only spawn greenlets, so gevent's native thread pool is used.
+    """
+    if gevent is not None and gevent_monkey.is_module_patched('threading'):
+        return gevent.get_hub().threadpool.apply(fn, args)
+    return _hash_pool.submit(fn, *args).result()
+
+
+def _map_in_hash_pool(fn, items) -> list:
+    """Run a password hashing call for each item in parallel and collect the results."""
+    if gevent is not None and gevent_monkey.is_module_patched('threading'):
+        return list(gevent.get_hub().threadpool.map(fn, items))
+    return list(_hash_pool.map(fn, items))
+
+
+def _verify_password(password: str, password_hash: str) -> bool:
+    """Check a password against an argon2id or legacy bcrypt hash."""
+    try:
+        if password_hash.startswith(_ARGON2_PREFIX):
+            return _password_hasher.verify(password_hash, password)
+        return bcrypt.checkpw(
+            password.encode('utf-8'),
+            password_hash.encode('utf-8')
+        )
+    except Exception:
+        return False
 
 
 class AuthService:
@@ -13,7 +98,7 @@ class AuthService:
     @staticmethod
     def hash_password(password: str) -> str:
         """
-        Hash a password using bcrypt.
+        Hash a password using argon2id.
         
         Args:
             password: Plain text password
@@ -21,15 +106,31 @@ class AuthService:
         Returns:
             str: Hashed password
         """
-        salt = bcrypt.gensalt(rounds=Config.BCRYPT_ROUNDS)
-        hashed = bcrypt.hashpw(password.encode('utf-8'), salt)
-        return hashed.decode('utf-8')
+        return _run_in_hash_pool(_password_hasher.hash, password)
+    
+    @staticmethod
+    def hash_passwords_batch(passwords: list[str]) -> list[str]:
+        """
+        Hash several passwords in parallel.
+        
+        Spreads the work across the hashing thread pool, so bulk imports
+        use multiple cores instead of hashing one password at a time.
+        
+        Args:
+            passwords: Plain text passwords
+            
+        Returns:
+            list: Hashed passwords, in the same order
+        """
+        return _map_in_hash_pool(_password_hasher.hash, passwords)
     
     @staticmethod
     def verify_password(password: str, password_hash: str) -> bool:
         """
         Verify a password against its hash.
         
+        Accepts argon2id hashes as well as legacy bcrypt hashes.
+        
         Args:
             password: Plain text password
             password_hash: Hashed password from database
@@ -37,13 +138,25 @@ class AuthService:
         Returns:
             bool: True if password matches, False otherwise
         """
-        try:
-            return bcrypt.checkpw(
-                password.encode('utf-8'),
-                password_hash.encode('utf-8')
-            )
-        except Exception:
-            return False
+        return _run_in_hash_pool(_verify_password, password, password_hash)
+    
+    @staticmethod
+    def needs_rehash(password_hash: str) -> bool:
+        """
+        Check whether a stored hash should be replaced with a fresh one.
+        
+        True for legacy bcrypt hashes and for argon2 hashes created with
+        parameters other than the configured ones.
+        
+        Args:
+            password_hash: Hashed password from database
+            
+        Returns:
+            bool: True if the password should be re-hashed
+        """
+        if not password_hash.startswith(_ARGON2_PREFIX):
+            return True
+        return _password_hasher.check_needs_rehash(password_hash)
     
     @staticmethod
     def generate_token(user_id: int, email: str, role: str) -> str:
@@ -58,16 +171,17 @@ class AuthService:
         Returns:
             str: JWT token
         """
-        expiration = datetime.utcnow() + timedelta(hours=Config.JWT_EXPIRATION_HOURS)
+        issued_at = int(time.time())
         
         payload = {
             'user_id': user_id,
             'email': email,
             'role': role,
-            'exp': expiration,
-            'iat': datetime.utcnow()
+            'exp': issued_at + _JWT_EXPIRATION_SECONDS,
+            'iat': issued_at
         }
         
-        token = jwt.encode(payload, Config.JWT_SECRET_KEY, algorithm=Config.JWT_ALGORITHM)
-        return token
+        if _JWT_ALGORITHM == 'HS256':
+            return _encode_hs256(payload)
+        return jwt.encode(payload, _JWT_SECRET_KEY, algorithm=_JWT_ALGORITHM)
 
@@ -1,10 +1,35 @@
 """
 Claim service for business logic related to insurance claims.
 """
-import random
-from datetime import datetime
+import secrets
+from datetime import date
+from postgrest.exceptions import APIError
 from services.supabase_client import SupabaseClient
-from services.policy_service import PolicyService
+from services._pg_errors import UNIQUE_VIOLATION
+from services.policy_service import PolicyService, POLICY_ACTIVITY_COLUMNS, parse_iso_date
+
+_VALID_CLAIM_STATUSES = frozenset(('submitted', 'under_review', 'approved', 'denied', 'paid'))
+_CLAIM_STATUS_ERROR = "Status must be one of: submitted, under_review, approved, denied, paid"
+_VALID_REVIEW_STATUSES = frozenset(('under_review', 'approved', 'denied'))
+_REVIEW_STATUS_ERROR = "Status must be one of: under_review, approved, denied"
+
+# Errors raised by review_claim_fn (no_data_found, raise_exception)
+_REVIEW_ERROR_CODES = frozenset(('P0002', 'P0001'))
+
+# Claim listings embed the claimant and policy so callers don't need follow-up queries
+_CLAIM_LIST_COLUMNS = '*, user:users!user_id(id, full_name, email), policy:policies(id, policy_number, plan_name)'
+
+# Claims with their policy, fetched in a single request
+_CLAIM_WITH_POLICY_COLUMNS = '*, policy:policies(id, policy_number, policy_type, plan_name, user_id, status)'
+
+
+def _parse_policy_id(value) -> int:
+    """Return a policy ID from request data (int or digit string) as an int, or None."""
+    if isinstance(value, int) and not isinstance(value, bool):
+        return value
+    if isinstance(value, str) and value.isdigit():
+        return int(value)
+    return None
 
 
 class ClaimService:
@@ -18,8 +43,7 @@ class ClaimService:
         Returns:
             str: Claim number
         """
-        digits = ''.join([str(random.randint(0, 9)) for _ in range(10)])
-        return f"CLM{digits}"
+        return f"CLM{secrets.randbelow(10_000_000_000):010d}"
     
     @staticmethod
     def validate_claim_data(claim_data: dict) -> tuple[bool, str]:
@@ -38,44 +62,25 @@ class ClaimService:
             if field not in claim_data:
                 return False, f"{field} is required"
         
+        if _parse_policy_id(claim_data['policy_id']) is None:
+            return False, "policy_id must be an integer"
+        
         # Validate claim amount is positive
         if float(claim_data['claim_amount']) <= 0:
             return False, "Claim amount must be positive"
         
         # Validate service date
-        try:
-            service_date = datetime.strptime(claim_data['service_date'], '%Y-%m-%d').date()
-            today = datetime.now().date()
-            if service_date > today:
-                return False, "Service date cannot be in the future"
-        except ValueError:
+        service_date = parse_iso_date(claim_data['service_date'])
+        if service_date is None:
             return False, "Invalid service date format. Use YYYY-MM-DD"
+        if service_date > date.today():
+            return False, "Service date cannot be in the future"
         
         return True, ""
     
     @staticmethod
-    def create_claim(claim_data: dict, user_id: int) -> dict:
-        """
-        Create a new claim.
-        
-        Args:
-            claim_data: Dictionary containing claim data
-            user_id: ID of user submitting the claim
-            
-        Returns:
-            dict: Created claim data
-        """
-        supabase = SupabaseClient.get_client()
-        
-        # Validate claim data
-        is_valid, error_msg = ClaimService.validate_claim_data(claim_data)
-        if not is_valid:
-            raise ValueError(error_msg)
-        
-        policy_id = claim_data['policy_id']
-        
-        # Check if policy exists and belongs to user
-        policy = PolicyService.get_policy_by_id(policy_id)
+    def _check_policy(policy: dict, user_id: int):
+        """Check that a claim may be submitted against a policy by this user."""
         if not policy:
             raise ValueError("Policy not found")
         
@@ -83,26 +88,14 @@ class ClaimService:
             raise PermissionError("You can only submit claims for your own policies")
         
         # Check if policy is active
-        if not PolicyService.is_policy_active(policy_id):
+        if not PolicyService.is_policy_active(policy=policy):
             raise ValueError("Cannot submit claim for inactive policy")
-        
-        # Generate unique claim number
-        claim_number = ClaimService.generate_claim_number()
-        
-        # Check for uniqueness (retry if needed)
-        max_retries = 10
-        for _ in range(max_retries):
-            existing = supabase.table('claims').select('id').eq('claim_number', claim_number).execute()
-            if not existing.data or len(existing.data) == 0:
-                break
-            claim_number = ClaimService.generate_claim_number()
-        else:
-            raise Exception("Failed to generate unique claim number")
-        
-        # Prepare claim data for insertion
-        insert_data = {
-            'claim_number': claim_number,
-            'policy_id': policy_id,
+    
+    @staticmethod
+    def _build_insert_row(claim_data: dict, user_id: int) -> dict:
+        """Build the claims row to insert for validated claim data (without claim_number)."""
+        return {
+            'policy_id': _parse_policy_id(claim_data['policy_id']),
             'user_id': user_id,
             'claim_amount': float(claim_data['claim_amount']),
             'approved_amount': 0.00,
@@ -112,60 +105,183 @@ class ClaimService:
             'provider_name': claim_data['provider_name'],
             'service_date': claim_data['service_date']
         }
+    
+    @staticmethod
+    def _insert_claims(rows: list) -> list:
+        """
+        Insert claim rows, assigning each a fresh claim number.
+        
+        claim_number is UNIQUE, so on the rare collision new numbers are
+        generated and the insert is retried instead of pre-checking each one.
+        
+        Args:
+            rows: Rows built by _build_insert_row
+            
+        Returns:
+            list: Inserted claims
+        """
+        supabase = SupabaseClient.get_client()
+        
+        max_retries = 10
+        for _ in range(max_retries):
+            for row in rows:
+                row['claim_number'] = ClaimService.generate_claim_number()
+            try:
+                response = supabase.table('claims').insert(rows).execute()
+                break
+            except APIError as e:
+                if e.code != UNIQUE_VIOLATION:
+                    raise
+        else:
+            raise Exception("Failed to generate unique claim number")
+        
+        return response.data
+    
+    @staticmethod
+    def create_claim(claim_data: dict, user_id: int) -> dict:
+        """
+        Create a new claim.
+        
+        Args:
+            claim_data: Dictionary containing claim data
+            user_id: ID of user submitting the claim
+            
+        Returns:
+            dict: Created claim data
+        """
+        # Validate claim data
+        is_valid, error_msg = ClaimService.validate_claim_data(claim_data)
+        if not is_valid:
+            raise ValueError(error_msg)
         
-        # Insert claim
-        response = supabase.table('claims').insert(insert_data).execute()
+        # Check that the policy exists, belongs to the user and is active (one query serves all checks)
+        policy_id = _parse_policy_id(claim_data['policy_id'])
+        policy = PolicyService.get_policy_by_id(policy_id, columns=POLICY_ACTIVITY_COLUMNS)
+        ClaimService._check_policy(policy, user_id)
         
-        if not response.data or len(response.data) == 0:
+        data = ClaimService._insert_claims([ClaimService._build_insert_row(claim_data, user_id)])
+        if not data:
             raise Exception("Failed to create claim")
         
-        return response.data[0]
+        return data[0]
+    
+    @staticmethod
+    def submit_claims(claims_data: list[dict], user_id: int) -> list[dict]:
+        """
+        Create several claims with a single insert.
+        
+        The policies of all claims are fetched with one query, and every
+        claim is checked before anything is written; the insert is
+        all-or-nothing.
+        
+        Args:
+            claims_data: List of dictionaries containing claim data
+            user_id: ID of user submitting the claims
+            
+        Returns:
+            list: Created claims, in the same order
+        """
+        for index, claim_data in enumerate(claims_data, start=1):
+            is_valid, error_msg = ClaimService.validate_claim_data(claim_data)
+            if not is_valid:
+                raise ValueError(f"Claim {index}: {error_msg}")
+        
+        policy_ids = [_parse_policy_id(claim_data['policy_id']) for claim_data in claims_data]
+        policies = PolicyService.get_policies_by_ids(set(policy_ids), columns=POLICY_ACTIVITY_COLUMNS)
+        
+        rows = []
+        for index, (claim_data, policy_id) in enumerate(zip(claims_data, policy_ids), start=1):
+            try:
+                ClaimService._check_policy(policies.get(policy_id), user_id)
+            except (ValueError, PermissionError) as e:
+                raise type(e)(f"Claim {index}: {e}") from None
+            rows.append(ClaimService._build_insert_row(claim_data, user_id))
+        
+        data = ClaimService._insert_claims(rows)
+        if not data or len(data) != len(rows):
+            raise Exception("Failed to create claims")
+        
+        return data
     
     @staticmethod
-    def get_claim_by_id(claim_id: int) -> dict:
+    def get_claim_by_id(claim_id: int, columns: str = '*') -> dict:
         """
         Get claim by ID.
         
         Args:
             claim_id: Claim ID
+            columns: Comma-separated columns to select (defaults to all)
             
         Returns:
             dict: Claim data or None
         """
         supabase = SupabaseClient.get_client()
-        response = supabase.table('claims').select('*').eq('id', claim_id).execute()
+        response = supabase.table('claims').select(columns).eq('id', claim_id).execute()
         
-        if not response.data or len(response.data) == 0:
+        data = response.data
+        if not data:
             return None
         
-        return response.data[0]
+        return data[0]
     
     @staticmethod
-    def get_claims_by_user(user_id: int) -> list:
+    def get_claims_by_user(user_id: int, columns: str = '*') -> list:
         """
         Get all claims for a specific user.
         
         Args:
             user_id: User ID
+            columns: Comma-separated columns to select (defaults to all)
             
         Returns:
             list: List of claims
         """
         supabase = SupabaseClient.get_client()
-        response = supabase.table('claims').select('*').eq('user_id', user_id).execute()
+        response = supabase.table('claims').select(columns).eq('user_id', user_id).execute()
         
         return response.data
     
     @staticmethod
-    def get_all_claims() -> list:
+    def get_claims_with_policy(user_id: int) -> list:
+        """
+        Get all claims for a specific user with each claim's policy embedded.
+        
+        The policy is joined by PostgREST in the same query, so callers
+        don't need a get_policy_by_id round trip per claim.
+        
+        Args:
+            user_id: User ID
+            
+        Returns:
+            list: List of claims, each with a 'policy' object
+        """
+        return ClaimService.get_claims_by_user(user_id, columns=_CLAIM_WITH_POLICY_COLUMNS)
+    
+    @staticmethod
+    def get_all_claims(limit: int = 100, offset: int = 0, after_id: int = None,
+                       columns: str = _CLAIM_LIST_COLUMNS) -> list:
         """
-        Get all claims.
+        Get one page of claims, ordered by ID, with their claimant and policy embedded.
         
+        To fetch the next page, pass the ID of the last claim returned as after_id.
+        
+        Args:
+            limit: Maximum number of claims to return
+            offset: Number of claims to skip (ignored when after_id is given)
+            after_id: Return only claims with a greater ID
+            columns: Columns to select (defaults to all claim columns plus
+                the embedded claimant and policy)
+            
         Returns:
-            list: List of all claims
+            list: List of claims
         """
         supabase = SupabaseClient.get_client()
-        response = supabase.table('claims').select('*').execute()
+        query = supabase.table('claims').select(columns).order('id')
+        if after_id is not None:
+            query = query.gt('id', after_id)
+        elif offset:
+            query = query.offset(offset)
+        response = query.limit(limit).execute()
         
         return response.data
     
@@ -174,6 +290,10 @@ class ClaimService:
         """
         Review a claim (approve/deny with notes).
         
+        The update runs in the review_claim_fn database function, which
+        checks the approved amount against the claim amount in the same
+        statement, so there is no separate read of the claim.
+        
         Args:
             claim_id: Claim ID
             review_data: Dictionary containing review decision and notes
@@ -182,54 +302,46 @@ class ClaimService:
         Returns:
             dict: Updated claim data
         """
-        supabase = SupabaseClient.get_client()
-        
-        # Get current claim
-        claim = ClaimService.get_claim_by_id(claim_id)
-        if not claim:
-            raise ValueError("Claim not found")
-        
         # Validate review data
         if 'status' not in review_data:
             raise ValueError("Status is required for review")
         
-        valid_statuses = ['under_review', 'approved', 'denied']
-        if review_data['status'] not in valid_statuses:
-            raise ValueError(f"Status must be one of: {', '.join(valid_statuses)}")
+        if review_data['status'] not in _VALID_REVIEW_STATUSES:
+            raise ValueError(_REVIEW_STATUS_ERROR)
         
-        # If approved, validate approved_amount
+        # If approved, validate approved_amount (the upper bound is checked by the database)
         if review_data['status'] == 'approved':
             if 'approved_amount' not in review_data:
                 raise ValueError("Approved amount is required when approving a claim")
             
             approved_amount = float(review_data['approved_amount'])
-            claim_amount = float(claim['claim_amount'])
             
             if approved_amount < 0:
                 raise ValueError("Approved amount cannot be negative")
-            
-            if approved_amount > claim_amount:
-                raise ValueError("Approved amount cannot exceed claim amount")
         else:
             # For denied or under_review, set approved_amount to 0
-            review_data['approved_amount'] = 0.00
-        
-        # Prepare update data
-        update_data = {
-            'status': review_data['status'],
-            'approved_amount': float(review_data.get('approved_amount', 0)),
-            'reviewed_by': reviewer_id,
-            'reviewed_at': datetime.utcnow().isoformat(),
-            'review_notes': review_data.get('review_notes', '')
-        }
+            approved_amount = 0.00
         
-        # Update claim
-        response = supabase.table('claims').update(update_data).eq('id', claim_id).execute()
-        
-        if not response.data or len(response.data) == 0:
+        supabase = SupabaseClient.get_client()
+        try:
+            response = supabase.rpc('review_claim_fn', {
+                'p_claim_id': claim_id,
+                'p_status': review_data['status'],
+                'p_approved_amount': approved_amount,
+                'p_reviewer_id': reviewer_id,
+                'p_notes': review_data.get('review_notes', '')
+            }).execute()
+        except APIError as e:
+            # "Claim not found" / "Approved amount cannot exceed claim amount"
+            if e.code in _REVIEW_ERROR_CODES:
+                raise ValueError(e.message) from None
+            raise
+        
+        data = response.data
+        if not data:
             raise Exception("Failed to update claim")
         
-        return response.data[0]
+        return data[0]
     
     @staticmethod
     def update_claim_status(claim_id: int, status: str) -> dict:
@@ -243,15 +355,15 @@ class ClaimService:
         Returns:
             dict: Updated claim data
         """
-        valid_statuses = ['submitted', 'under_review', 'approved', 'denied', 'paid']
-        if status not in valid_statuses:
-            raise ValueError(f"Status must be one of: {', '.join(valid_statuses)}")
+        if status not in _VALID_CLAIM_STATUSES:
+            raise ValueError(_CLAIM_STATUS_ERROR)
         
         supabase = SupabaseClient.get_client()
         response = supabase.table('claims').update({'status': status}).eq('id', claim_id).execute()
         
-        if not response.data or len(response.data) == 0:
+        data = response.data
+        if not data:
             raise Exception("Claim not found")
         
-        return response.data[0]
+        return data[0]
 
@@ -1,9 +1,51 @@
 """
 Policy service for business logic related to insurance policies.
 """
-import random
-from datetime import datetime
+import secrets
+from datetime import date
+from postgrest.exceptions import APIError
 from services.supabase_client import SupabaseClient
+from services._pg_errors import UNIQUE_VIOLATION, FOREIGN_KEY_VIOLATION
+from utils.cache import TTLCache
+
+_VALID_POLICY_STATUSES = frozenset(('active', 'inactive', 'suspended', 'cancelled'))
+_POLICY_STATUS_ERROR = "Status must be one of: active, inactive, suspended, cancelled"
+_VALID_PAYER_PROGRAMS = frozenset(('medicare', 'medicaid', 'commercial', 'other_government'))
+_PAYER_PROGRAM_ERROR = "payer_program must be one of: medicare, medicaid, commercial, other_government"
+_VALID_MEDICARE_PARTS = frozenset(('Part A', 'Part B', 'Part C', 'Part D'))
+
+# Columns needed to check ownership and whether a policy is active
+POLICY_ACTIVITY_COLUMNS = 'id,user_id,status,start_date,end_date'
+
+# Policy listings embed the policy holder so callers don't need follow-up queries
+_POLICY_LIST_COLUMNS = '*, user:users!user_id(id, full_name, email)'
+
+# Recently read policies: policy_id -> {columns: row}. Kept short-lived to
+# bound staleness across workers; local updates invalidate immediately.
+_policy_cache = TTLCache(maxsize=1024, ttl=5)
+
+_DATE_FORMAT_ERROR = "Invalid date format. Use YYYY-MM-DD"
+
+
+def parse_iso_date(value) -> date:
+    """
+    Parse a YYYY-MM-DD date string.
+    
+    Malformed input is rejected by a cheap shape check before parsing, so
+    the common bad-input cases don't go through exception handling.
+    
+    Args:
+        value: Date string
+        
+    Returns:
+        date: Parsed date, or None if value is not a valid YYYY-MM-DD date
+    """
+    if not (isinstance(value, str) and len(value) == 10 and value[4] == '-' and value[7] == '-'):
+        return None
+    try:
+        return date.fromisoformat(value)
+    except ValueError:
+        return None
 
 
 class PolicyService:
@@ -17,8 +59,7 @@ class PolicyService:
         Returns:
             str: Policy number
         """
-        digits = ''.join([str(random.randint(0, 9)) for _ in range(10)])
-        return f"POL{digits}"
+        return f"POL{secrets.randbelow(10_000_000_000):010d}"
     
     @staticmethod
     def validate_policy_data(policy_data: dict) -> tuple[bool, str]:
@@ -41,15 +82,14 @@ class PolicyService:
                 return False, f"{field} is required"
         
         # Validate payer_program
-        valid_payer_programs = ['medicare', 'medicaid', 'commercial', 'other_government']
-        if policy_data['payer_program'] not in valid_payer_programs:
-            return False, f"payer_program must be one of: {', '.join(valid_payer_programs)}"
+        if policy_data['payer_program'] not in _VALID_PAYER_PROGRAMS:
+            return False, _PAYER_PROGRAM_ERROR
         
         # Medicare-specific validation
         if policy_data['payer_program'] == 'medicare':
             if 'medicare_part' not in policy_data or not policy_data['medicare_part']:
                 return False, "medicare_part is required for Medicare policies (Part A, B, C, or D)"
-            if policy_data['medicare_part'] not in ['Part A', 'Part B', 'Part C', 'Part D']:
+            if policy_data['medicare_part'] not in _VALID_MEDICARE_PARTS:
                 return False, "medicare_part must be Part A, B, C, or D"
         
         # Medicaid-specific validation
@@ -72,59 +112,24 @@ class PolicyService:
                 return False, "Deductible amount cannot be negative"
         
         # Validate date range
-        start_date = datetime.strptime(policy_data['start_date'], '%Y-%m-%d').date()
-        end_date = datetime.strptime(policy_data['end_date'], '%Y-%m-%d').date()
+        start_date = parse_iso_date(policy_data['start_date'])
+        end_date = parse_iso_date(policy_data['end_date'])
+        if start_date is None or end_date is None:
+            return False, _DATE_FORMAT_ERROR
         
         if end_date <= start_date:
             return False, "End date must be after start date"
         
         # Validate status
-        valid_statuses = ['active', 'inactive', 'suspended', 'cancelled']
-        if 'status' in policy_data and policy_data['status'] not in valid_statuses:
-            return False, f"Status must be one of: {', '.join(valid_statuses)}"
+        if 'status' in policy_data and policy_data['status'] not in _VALID_POLICY_STATUSES:
+            return False, _POLICY_STATUS_ERROR
         
         return True, ""
     
     @staticmethod
-    def create_policy(policy_data: dict, created_by: int) -> dict:
-        """
-        Create a new insurance policy with healthcare payer program details.
-        
-        Args:
-            policy_data: Dictionary containing policy data
-            created_by: ID of user creating the policy
-            
-        Returns:
-            dict: Created policy data
-        """
-        supabase = SupabaseClient.get_client()
-        
-        # Validate policy data
-        is_valid, error_msg = PolicyService.validate_policy_data(policy_data)
-        if not is_valid:
-            raise ValueError(error_msg)
-        
-        # Check if user exists
-        user_response = supabase.table('users').select('id').eq('id', policy_data['user_id']).execute()
-        if not user_response.data or len(user_response.data) == 0:
-            raise ValueError("User not found")
-        
-        # Generate unique policy number
-        policy_number = PolicyService.generate_policy_number()
-        
-        # Check for uniqueness (retry if needed)
-        max_retries = 10
-        for _ in range(max_retries):
-            existing = supabase.table('policies').select('id').eq('policy_number', policy_number).execute()
-            if not existing.data or len(existing.data) == 0:
-                break
-            policy_number = PolicyService.generate_policy_number()
-        else:
-            raise Exception("Failed to generate unique policy number")
-        
-        # Prepare policy data for insertion
+    def _build_insert_row(policy_data: dict, created_by: int) -> dict:
+        """Build the policies row to insert for validated policy data (without policy_number)."""
         insert_data = {
-            'policy_number': policy_number,
             'user_id': policy_data['user_id'],
             'payer_program': policy_data['payer_program'],
             'payer_name': policy_data['payer_name'],
@@ -150,75 +155,202 @@ class PolicyService:
             insert_data['medicaid_state'] = policy_data.get('medicaid_state')
             insert_data['medicaid_program_type'] = policy_data.get('medicaid_program_type')
         
-        # Insert policy
-        response = supabase.table('policies').insert(insert_data).execute()
+        return insert_data
+    
+    @staticmethod
+    def _insert_policies(rows: list) -> list:
+        """
+        Insert policy rows, assigning each a fresh policy number.
+        
+        policy_number is UNIQUE, so on the rare collision new numbers are
+        generated and the insert is retried instead of pre-checking each one.
+        A missing user is reported by the user_id foreign key.
+        
+        Args:
+            rows: Rows built by _build_insert_row
+            
+        Returns:
+            list: Inserted policies
+        """
+        supabase = SupabaseClient.get_client()
+        
+        max_retries = 10
+        for _ in range(max_retries):
+            for row in rows:
+                row['policy_number'] = PolicyService.generate_policy_number()
+            try:
+                response = supabase.table('policies').insert(rows).execute()
+                break
+            except APIError as e:
+                if e.code == FOREIGN_KEY_VIOLATION:
+                    raise ValueError("User not found")
+                if e.code != UNIQUE_VIOLATION:
+                    raise
+        else:
+            raise Exception("Failed to generate unique policy number")
         
-        if not response.data or len(response.data) == 0:
+        return response.data
+    
+    @staticmethod
+    def create_policy(policy_data: dict, created_by: int) -> dict:
+        """
+        Create a new insurance policy with healthcare payer program details.
+        
+        Args:
+            policy_data: Dictionary containing policy data
+            created_by: ID of user creating the policy
+            
+        Returns:
+            dict: Created policy data
+        """
+        # Validate policy data
+        is_valid, error_msg = PolicyService.validate_policy_data(policy_data)
+        if not is_valid:
+            raise ValueError(error_msg)
+        
+        data = PolicyService._insert_policies([PolicyService._build_insert_row(policy_data, created_by)])
+        if not data:
             raise Exception("Failed to create policy")
         
-        return response.data[0]
+        return data[0]
+    
+    @staticmethod
+    def create_policies(policies_data: list[dict], created_by: int) -> list[dict]:
+        """
+        Create several policies with a single insert.
+        
+        All policies are validated before anything is written, and the
+        insert is all-or-nothing.
+        
+        Args:
+            policies_data: List of dictionaries containing policy data
+            created_by: ID of user creating the policies
+            
+        Returns:
+            list: Created policies, in the same order
+        """
+        rows = []
+        for index, policy_data in enumerate(policies_data, start=1):
+            is_valid, error_msg = PolicyService.validate_policy_data(policy_data)
+            if not is_valid:
+                raise ValueError(f"Policy {index}: {error_msg}")
+            rows.append(PolicyService._build_insert_row(policy_data, created_by))
+        
+        data = PolicyService._insert_policies(rows)
+        if not data or len(data) != len(rows):
+            raise Exception("Failed to create policies")
+        
+        return data
     
     @staticmethod
-    def get_policy_by_id(policy_id: int) -> dict:
+    def get_policy_by_id(policy_id: int, columns: str = '*') -> dict:
         """
         Get policy by ID.
         
+        Results are cached for a few seconds.
+        
         Args:
             policy_id: Policy ID
+            columns: Comma-separated columns to select (defaults to all)
             
         Returns:
             dict: Policy data or None
         """
+        cached = _policy_cache.get(policy_id)
+        if cached is not None and columns in cached:
+            return cached[columns]
+        
         supabase = SupabaseClient.get_client()
-        response = supabase.table('policies').select('*').eq('id', policy_id).execute()
+        response = supabase.table('policies').select(columns).eq('id', policy_id).execute()
         
-        if not response.data or len(response.data) == 0:
+        data = response.data
+        if not data:
             return None
         
-        return response.data[0]
+        policy = data[0]
+        if cached is None:
+            cached = {}
+            _policy_cache.set(policy_id, cached)
+        cached[columns] = policy
+        return policy
     
     @staticmethod
-    def get_policies_by_user(user_id: int) -> list:
+    def get_policies_by_ids(policy_ids: list[int], columns: str = '*') -> dict:
+        """
+        Get several policies with one query.
+        
+        Args:
+            policy_ids: Policy IDs
+            columns: Comma-separated columns to select (must include id)
+            
+        Returns:
+            dict: Policy data keyed by policy ID (missing policies are absent)
+        """
+        supabase = SupabaseClient.get_client()
+        response = supabase.table('policies').select(columns).in_('id', list(policy_ids)).execute()
+        
+        return {policy['id']: policy for policy in response.data or []}
+    
+    @staticmethod
+    def get_policies_by_user(user_id: int, columns: str = '*') -> list:
         """
         Get all policies for a specific user.
         
         Args:
             user_id: User ID
+            columns: Comma-separated columns to select (defaults to all)
             
         Returns:
             list: List of policies
         """
         supabase = SupabaseClient.get_client()
-        response = supabase.table('policies').select('*').eq('user_id', user_id).order('created_at', desc=True).execute()
+        response = supabase.table('policies').select(columns).eq('user_id', user_id).order('created_at', desc=True).execute()
         
         return response.data
     
     @staticmethod
-    def get_policies_by_payer_program(payer_program: str) -> list:
+    def get_policies_by_payer_program(payer_program: str, columns: str = '*') -> list:
         """
         Get policies filtered by payer program (Medicare, Medicaid, Commercial).
         
         Args:
             payer_program: Payer program type
+            columns: Comma-separated columns to select (defaults to all)
             
         Returns:
             list: List of policies
         """
         supabase = SupabaseClient.get_client()
-        response = supabase.table('policies').select('*').eq('payer_program', payer_program).order('created_at', desc=True).execute()
+        response = supabase.table('policies').select(columns).eq('payer_program', payer_program).order('created_at', desc=True).execute()
         
         return response.data
     
     @staticmethod
-    def get_all_policies() -> list:
+    def get_all_policies(limit: int = 100, offset: int = 0, after_id: int = None,
+                         columns: str = _POLICY_LIST_COLUMNS) -> list:
         """
-        Get all policies.
+        Get one page of policies, newest first, with their policy holder embedded.
+        
+        after_id continues from the last policy of the previous page. Unlike a
+        large offset, it does not make the database walk past skipped rows.
         
+        Args:
+            limit: Maximum number of policies to return
+            offset: Number of policies to skip (ignored when after_id is given)
+            after_id: Return only policies with a smaller (older) ID
+            columns: Columns to select (defaults to all policy columns plus
+                the embedded policy holder)
+            
         Returns:
-            list: List of all policies
+            list: List of policies
         """
         supabase = SupabaseClient.get_client()
-        response = supabase.table('policies').select('*').order('created_at', desc=True).execute()
+        query = supabase.table('policies').select(columns).order('id', desc=True)
+        if after_id is not None:
+            query = query.lt('id', after_id)
+        elif offset:
+            query = query.offset(offset)
+        response = query.limit(limit).execute()
         
         return response.data
     
@@ -227,43 +359,30 @@ class PolicyService:
         """
         Get statistics grouped by payer program.
         
+        Aggregation runs in Postgres (get_payer_program_stats function),
+        so only one row per program is transferred.
+        
         Returns:
             dict: Statistics by payer program
         """
         supabase = SupabaseClient.get_client()
-        response = supabase.table('policies').select('payer_program, status, coverage_amount, premium_amount').execute()
+        response = supabase.rpc('get_payer_program_stats').execute()
         
-        if not response.data or len(response.data) == 0:
-            return {
-                'total_policies': 0,
-                'by_program': {}
+        total_policies = 0
+        programs = {}
+        for row in response.data or []:
+            programs[row['payer_program']] = {
+                'count': row['count'],
+                'active': row['active'],
+                'total_coverage': float(row['total_coverage']),
+                'total_premiums': float(row['total_premiums'])
             }
+            total_policies += row['count']
         
-        # Group statistics
-        stats = {
-            'total_policies': len(response.data),
-            'by_program': {}
+        return {
+            'total_policies': total_policies,
+            'by_program': programs
         }
-        
-        programs = {}
-        for policy in response.data:
-            prog = policy['payer_program']
-            if prog not in programs:
-                programs[prog] = {
-                    'count': 0,
-                    'active': 0,
-                    'total_coverage': 0,
-                    'total_premiums': 0
-                }
-            
-            programs[prog]['count'] += 1
-            if policy['status'] == 'active':
-                programs[prog]['active'] += 1
-            programs[prog]['total_coverage'] += float(policy.get('coverage_amount', 0))
-            programs[prog]['total_premiums'] += float(policy.get('premium_amount', 0))
-        
-        stats['by_program'] = programs
-        return stats
     
     @staticmethod
     def update_policy(policy_id: int, update_data: dict) -> dict:
@@ -287,9 +406,8 @@ class PolicyService:
         
         # Validate payer_program if being updated
         if 'payer_program' in update_data:
-            valid_payer_programs = ['medicare', 'medicaid', 'commercial', 'other_government']
-            if update_data['payer_program'] not in valid_payer_programs:
-                raise ValueError(f"payer_program must be one of: {', '.join(valid_payer_programs)}")
+            if update_data['payer_program'] not in _VALID_PAYER_PROGRAMS:
+                raise ValueError(_PAYER_PROGRAM_ERROR)
         
         # Validate amounts if provided
         if 'coverage_amount' in update_data:
@@ -307,32 +425,35 @@ class PolicyService:
         # Validate date range if dates are being updated
         if 'start_date' in update_data or 'end_date' in update_data:
             # Get current policy to compare dates
-            current_policy = PolicyService.get_policy_by_id(policy_id)
+            current_policy = PolicyService.get_policy_by_id(policy_id, columns='start_date,end_date')
             if not current_policy:
                 raise ValueError("Policy not found")
             
             start_date_str = update_data.get('start_date', current_policy['start_date'])
             end_date_str = update_data.get('end_date', current_policy['end_date'])
             
-            start_date = datetime.strptime(start_date_str, '%Y-%m-%d').date()
-            end_date = datetime.strptime(end_date_str, '%Y-%m-%d').date()
+            start_date = parse_iso_date(start_date_str)
+            end_date = parse_iso_date(end_date_str)
+            if start_date is None or end_date is None:
+                raise ValueError(_DATE_FORMAT_ERROR)
             
             if end_date <= start_date:
                 raise ValueError("End date must be after start date")
         
         # Validate status if provided
         if 'status' in update_data:
-            valid_statuses = ['active', 'inactive', 'suspended', 'cancelled']
-            if update_data['status'] not in valid_statuses:
-                raise ValueError(f"Status must be one of: {', '.join(valid_statuses)}")
+            if update_data['status'] not in _VALID_POLICY_STATUSES:
+                raise ValueError(_POLICY_STATUS_ERROR)
         
         # Update policy
         response = supabase.table('policies').update(update_data).eq('id', policy_id).execute()
+        _policy_cache.pop(policy_id)
         
-        if not response.data or len(response.data) == 0:
+        data = response.data
+        if not data:
             raise Exception("Policy not found or update failed")
         
-        return response.data[0]
+        return data[0]
     
     @staticmethod
     def update_policy_status(policy_id: int, status: str) -> dict:
@@ -346,24 +467,25 @@ class PolicyService:
         Returns:
             dict: Updated policy data
         """
-        valid_statuses = ['active', 'inactive', 'suspended', 'cancelled']
-        if status not in valid_statuses:
-            raise ValueError(f"Status must be one of: {', '.join(valid_statuses)}")
+        if status not in _VALID_POLICY_STATUSES:
+            raise ValueError(_POLICY_STATUS_ERROR)
         
         return PolicyService.update_policy(policy_id, {'status': status})
     
     @staticmethod
-    def is_policy_active(policy_id: int) -> bool:
+    def is_policy_active(policy_id: int = None, policy: dict = None) -> bool:
         """
         Check if a policy is active.
         
         Args:
-            policy_id: Policy ID
+            policy_id: Policy ID (fetched if policy is not given)
+            policy: Already fetched policy with status, start_date and end_date
             
         Returns:
             bool: True if policy is active, False otherwise
         """
-        policy = PolicyService.get_policy_by_id(policy_id)
+        if policy is None:
+            policy = PolicyService.get_policy_by_id(policy_id, columns=POLICY_ACTIVITY_COLUMNS)
         if not policy:
             return False
         
@@ -371,9 +493,7 @@ class PolicyService:
         if policy['status'] != 'active':
             return False
         
-        # Check date range
-        today = datetime.now().date()
-        start_date = datetime.strptime(policy['start_date'], '%Y-%m-%d').date()
-        end_date = datetime.strptime(policy['end_date'], '%Y-%m-%d').date()
+        # Check date range (ISO dates compare correctly as strings)
+        today = date.today().isoformat()
         
-        return start_date <= today <= end_date
\ No newline at end of file
+        return policy['start_date'] <= today <= policy['end_date']
\ No newline at end of file
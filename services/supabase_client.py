@@ -1,33 +1,110 @@
 """
 Singleton Supabase client for database operations.
 """
-from supabase import create_client, Client
+import socket
+import threading
+import httpx
+from supabase import create_client, Client, ClientOptions
 from config import Config
+from utils.serialization import to_json
+
+
+class _SupabaseHTTPClient(httpx.Client):
+    """
+    httpx client that encodes JSON request bodies with orjson.
+    
+    postgrest-py sends rows through httpx's json= argument, which is encoded
+    with the stdlib json module. Encoding them here keeps the change scoped
+    to Supabase traffic instead of patching httpx for the whole process.
+    """
+    
+    def build_request(self, method, url, *, content=None, json=None, headers=None, **kwargs):
+        if json is not None and content is None:
+            content = to_json(json)
+            headers = httpx.Headers(headers)
+            headers.setdefault('Content-Type', 'application/json')
+            json = None
+        return super().build_request(method, url, content=content, json=json, headers=headers, **kwargs)
+
+
+def _create_http_client() -> httpx.Client:
+    """
+    Create the pooled HTTP client shared by all Supabase requests.
+    
+    Keeps connections alive across requests so the TCP+TLS handshake
+    is paid once per connection rather than once per query.
+    
+    Returns:
+        httpx.Client: HTTP/2 client with a keep-alive connection pool
+    """
+    transport = httpx.HTTPTransport(
+        http2=True,
+        limits=httpx.Limits(
+            max_connections=Config.SUPABASE_MAX_CONNECTIONS,
+            max_keepalive_connections=Config.SUPABASE_MAX_KEEPALIVE_CONNECTIONS,
+            keepalive_expiry=Config.SUPABASE_KEEPALIVE_EXPIRY
+        ),
+        socket_options=[(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)]
+    )
+    # Fail fast when a new connection cannot be opened; reads keep the longer timeout
+    timeout = httpx.Timeout(Config.SUPABASE_TIMEOUT, connect=Config.SUPABASE_CONNECT_TIMEOUT)
+    return _SupabaseHTTPClient(transport=transport, timeout=timeout)
 
 
 class SupabaseClient:
     """Singleton class for Supabase client."""
     
     _instance: Client = None
-    _initialized = False
+    _http_client: httpx.Client = None
+    _lock = threading.Lock()
     
     @classmethod
     def get_client(cls) -> Client:
         """
         Get or create the Supabase client instance.
         
+        Thread-safe: concurrent first calls construct a single client.
+        
         Returns:
             Client: Supabase client instance
         """
-        if cls._instance is None:
-            Config.validate()
-            cls._instance = create_client(Config.SUPABASE_URL, Config.SUPABASE_KEY)
-            cls._initialized = True
-        return cls._instance
+        instance = cls._instance
+        if instance is None:
+            with cls._lock:
+                if cls._instance is None:
+                    Config.validate()
+                    cls._http_client = _create_http_client()
+                    cls._instance = create_client(
+                        Config.SUPABASE_URL,
+                        Config.SUPABASE_KEY,
+                        options=ClientOptions(httpx_client=cls._http_client)
+                    )
+                instance = cls._instance
+        return instance
+    
+    @classmethod
+    def warm_up(cls) -> bool:
+        """
+        Create the client and open a pooled connection ahead of traffic.
+        
+        Issues a cheap query so the TCP+TLS handshake happens at startup
+        rather than on the first user request. Failures are not fatal; the
+        connection is simply opened on first use instead.
+        
+        Returns:
+            bool: True if the warm-up query succeeded
+        """
+        try:
+            cls.get_client().table('users').select('id').limit(1).execute()
+            return True
+        except Exception:
+            return False
     
     @classmethod
     def reset(cls):
         """Reset the singleton instance (useful for testing)."""
-        cls._instance = None
-        cls._initialized = False
-
+        with cls._lock:
+            if cls._http_client is not None:
+                cls._http_client.close()
+            cls._instance = None
+            cls._http_client = None
@@ -1,8 +1,83 @@
 """
 User service for business logic related to user management.
 """
+import threading
 from services.supabase_client import SupabaseClient
+from services._pg_errors import classify
 from services.auth_service import AuthService
+from utils.cache import TTLCache
+
+_ALLOWED_ROLES = frozenset(('patient', 'provider', 'administrator'))
+
+# Every users column except password_hash, for reads that are returned to clients
+USER_COLUMNS = 'id,email,full_name,role,phone,address,date_of_birth,is_active,created_at,updated_at'
+
+# Columns the login flow needs: credentials, status and the user summary it returns
+LOGIN_COLUMNS = 'id,email,full_name,role,is_active,password_hash'
+
+# Recently read users keyed by ID, and the full user list. Writes invalidate
+# only this worker's caches; other workers serve their copy until the TTL.
+_user_cache = TTLCache(maxsize=10_000, ttl=30)
+_all_users_cache = TTLCache(maxsize=1, ttl=5)
+_ALL_USERS = 'all'
+
+# Per-user write counters, so a lookup that raced with a write does not
+# re-cache the row it read before the write
+_user_generations = {}
+_user_generations_lock = threading.Lock()
+
+# In-flight user lookups keyed by ID, so concurrent cache misses for the same
+# user share one query
+_user_loads = {}
+_user_loads_lock = threading.Lock()
+
+
+class _UserLoad:
+    """Outcome of an in-flight user lookup, shared with concurrent callers."""
+    
+    __slots__ = ('done', 'user', 'error')
+    
+    def __init__(self):
+        self.done = threading.Event()
+        self.user = None
+        self.error = None
+
+
+def _returning(query, columns: str):
+    """
+    Limit the row returned by an insert/update query to the given columns.
+    
+    postgrest-py has no select() on mutations, but PostgREST honours a
+    select parameter on them, so the projection is applied server-side.
+    """
+    query.request.params = query.request.params.add('select', columns)
+    return query
+
+
+def _invalidate(user_id: int = None):
+    """Drop cached reads affected by a write to users (user_id None for inserts)."""
+    if user_id is not None:
+        with _user_generations_lock:
+            _user_generations[user_id] = _user_generations.get(user_id, 0) + 1
+            _user_cache.pop(user_id)
+    _all_users_cache.clear()
+
+
+def _load_user(user_id: int) -> dict:
+    """Fetch a user row from the database and cache it if found."""
+    generation = _user_generations.get(user_id, 0)
+    
+    supabase = SupabaseClient.get_client()
+    response = supabase.table('users').select(USER_COLUMNS).eq('id', user_id).maybe_single().execute()
+    
+    # Some postgrest-py versions return no response at all when nothing matched
+    user = response.data if response else None
+    if user:
+        with _user_generations_lock:
+            # Skip caching a row read before a concurrent write invalidated it
+            if _user_generations.get(user_id, 0) == generation:
+                _user_cache.set(user_id, user)
+    return user
 
 
 class UserService:
@@ -19,8 +94,7 @@ class UserService:
         Returns:
             bool: True if valid, False otherwise
         """
-        allowed_roles = ['patient', 'provider', 'administrator']
-        return role in allowed_roles
+        return role in _ALLOWED_ROLES
     
     @staticmethod
     def validate_password(password: str) -> tuple[bool, str]:
@@ -38,18 +112,16 @@ class UserService:
         return True, ""
     
     @staticmethod
-    def create_user(user_data: dict) -> dict:
+    def _validate_new_user(user_data: dict) -> str:
         """
-        Create a new user.
+        Validate the role and password of a user about to be created.
         
         Args:
             user_data: Dictionary containing user data
             
         Returns:
-            dict: Created user data (without password_hash)
+            str: Role to assign
         """
-        supabase = SupabaseClient.get_client()
-        
         # Validate role
         role = user_data.get('role', 'patient')
         if not UserService.validate_role(role):
@@ -64,11 +136,12 @@ class UserService:
         if not is_valid:
             raise ValueError(error_msg)
         
-        # Hash password
-        password_hash = AuthService.hash_password(password)
-        
-        # Prepare user data for insertion
-        insert_data = {
+        return role
+    
+    @staticmethod
+    def _build_insert_row(user_data: dict, role: str, password_hash: str) -> dict:
+        """Build the users row to insert for a validated user."""
+        return {
             'email': user_data['email'],
             'password_hash': password_hash,
             'full_name': user_data['full_name'],
@@ -78,54 +151,103 @@ class UserService:
             'date_of_birth': user_data.get('date_of_birth'),
             'is_active': user_data.get('is_active', True)
         }
+    
+    @staticmethod
+    def _insert_users(rows) -> list:
+        """
+        Insert one or more rows into users, translating Supabase errors.
+        
+        Args:
+            rows: Row dict or list of row dicts
+            
+        Returns:
+            list: Inserted rows
+        """
+        supabase = SupabaseClient.get_client()
         
-        # Insert user
         try:
-            response = supabase.table('users').insert(insert_data).execute()
+            response = supabase.table('users').insert(rows).execute()
         except Exception as e:
-            error_msg = str(e)
-            error_type = type(e).__name__
-            # Get more details from the exception if available
-            error_details = ""
-            if hasattr(e, 'message'):
-                error_details = f" Message: {e.message}"
-            if hasattr(e, 'code'):
-                error_details += f" Code: {e.code}"
-            if hasattr(e, 'hint'):
-                error_details += f" Hint: {e.hint}"
+            raise classify(e, 'users') from e
+        
+        return response.data
+    
+    @staticmethod
+    def create_user(user_data: dict) -> dict:
+        """
+        Create a new user.
+        
+        Args:
+            user_data: Dictionary containing user data
             
-            # Check for common Supabase errors - be more specific
-            error_lower = error_msg.lower()
-            if any(term in error_lower for term in ['invalid api key', 'api key', 'apikey', '401', 'unauthorized', 'forbidden']):
-                # Try to get the actual Supabase error response
-                actual_error = error_msg
-                if hasattr(e, 'args') and len(e.args) > 0:
-                    actual_error = str(e.args[0])
-                raise ValueError(f"Supabase API key error: {actual_error}. Please verify:\n1. SUPABASE_URL format: https://xxx.supabase.co\n2. SUPABASE_KEY is the full key (starts with 'eyJ')\n3. No quotes or extra spaces in .env\n4. Restart Flask after .env changes")
-            elif 'JWT' in error_msg or 'token' in error_lower:
-                raise ValueError("Supabase authentication error. Please check your SUPABASE_KEY in .env file.")
-            elif 'relation' in error_lower or 'does not exist' in error_lower or 'table' in error_lower:
-                raise ValueError("Database table 'users' does not exist. Please run database_schema.sql in Supabase SQL Editor.")
-            else:
-                # Include full error details for debugging - this will help us see the actual error
-                full_error = f"Supabase error ({error_type}): {error_msg}"
-                if error_details:
-                    full_error += error_details
-                raise Exception(full_error)
-        
-        if not response.data or len(response.data) == 0:
+        Returns:
+            dict: Created user data (without password_hash)
+        """
+        role = UserService._validate_new_user(user_data)
+        
+        # Hash password
+        password_hash = AuthService.hash_password(user_data['password'])
+        
+        # Insert user
+        data = UserService._insert_users(UserService._build_insert_row(user_data, role, password_hash))
+        _invalidate()
+        
+        if not data:
             raise Exception("Failed to create user")
         
-        user = response.data[0]
+        user = data[0]
         # Remove password_hash from response
         user.pop('password_hash', None)
         
         return user
     
+    @staticmethod
+    def create_users(users: list[dict]) -> list[dict]:
+        """
+        Create several users with a single insert.
+        
+        All users are validated before anything is written, and the insert
+        is all-or-nothing (e.g., one duplicate email rejects the batch).
+        
+        Args:
+            users: List of dictionaries containing user data
+            
+        Returns:
+            list: Created users (without password_hash), in the same order
+        """
+        roles = []
+        for index, user_data in enumerate(users, start=1):
+            try:
+                roles.append(UserService._validate_new_user(user_data))
+            except ValueError as e:
+                raise ValueError(f"User {index}: {e}") from None
+        
+        # Hash all passwords in parallel on the hashing thread pool
+        password_hashes = AuthService.hash_passwords_batch([user_data['password'] for user_data in users])
+        
+        rows = [
+            UserService._build_insert_row(user_data, role, password_hash)
+            for user_data, role, password_hash in zip(users, roles, password_hashes)
+        ]
+        
+        data = UserService._insert_users(rows)
+        _invalidate()
+        
+        if not data or len(data) != len(rows):
+            raise Exception("Failed to create users")
+        
+        for user in data:
+            user.pop('password_hash', None)
+        
+        return data
+    
     @staticmethod
     def get_user_by_id(user_id: int) -> dict:
         """
-        Get user by ID.
+        Get user by ID (cached for a short time).
+        
+        Concurrent cache misses for the same user wait on a single query
+        instead of each hitting the database.
         
         Args:
             user_id: User ID
@@ -133,50 +255,64 @@ class UserService:
         Returns:
             dict: User data (without password_hash)
         """
-        supabase = SupabaseClient.get_client()
-        response = supabase.table('users').select('*').eq('id', user_id).execute()
-        
-        if not response.data or len(response.data) == 0:
-            return None
+        user = _user_cache.get(user_id)
+        if user is not None:
+            return user
+        
+        with _user_loads_lock:
+            load = _user_loads.get(user_id)
+            leader = load is None
+            if leader:
+                load = _user_loads[user_id] = _UserLoad()
+        
+        if not leader:
+            # Another request is already fetching this user; share its outcome
+            load.done.wait()
+            if load.error is not None:
+                raise load.error
+            return load.user
         
-        user = response.data[0]
-        user.pop('password_hash', None)
-        return user
+        try:
+            load.user = _load_user(user_id)
+            return load.user
+        except Exception as e:
+            load.error = e
+            raise
+        finally:
+            with _user_loads_lock:
+                del _user_loads[user_id]
+            load.done.set()
     
     @staticmethod
-    def get_user_by_email(email: str) -> dict:
+    def get_user_by_email(email: str, columns: str = LOGIN_COLUMNS) -> dict:
         """
         Get user by email.
         
         Args:
             email: User email
+            columns: Comma-separated columns to select (defaults to what login needs)
             
         Returns:
             dict: User data (including password_hash for auth)
         """
         supabase = SupabaseClient.get_client()
-        response = supabase.table('users').select('*').eq('email', email).execute()
-        
-        if not response.data or len(response.data) == 0:
-            return None
+        response = supabase.table('users').select(columns).eq('email', email).maybe_single().execute()
         
-        return response.data[0]
+        return response.data if response else None
     
     @staticmethod
     def get_all_users() -> list:
         """
-        Get all users.
+        Get all users (cached for a short time).
         
         Returns:
             list: List of user data (without password_hash)
         """
-        supabase = SupabaseClient.get_client()
-        response = supabase.table('users').select('*').execute()
-        
-        users = response.data
-        # Remove password_hash from all users
-        for user in users:
-            user.pop('password_hash', None)
+        users = _all_users_cache.get(_ALL_USERS)
+        if users is None:
+            supabase = SupabaseClient.get_client()
+            users = supabase.table('users').select(USER_COLUMNS).execute().data
+            _all_users_cache.set(_ALL_USERS, users)
         
         return users
     
@@ -193,8 +329,6 @@ class UserService:
         Returns:
             dict: Updated user data (without password_hash)
         """
-        supabase = SupabaseClient.get_client()
-        
         # Check permissions: users can only update their own profile unless they're admin
         if current_user['role'] != 'administrator' and current_user['id'] != user_id:
             raise PermissionError("You can only update your own profile")
@@ -218,37 +352,61 @@ class UserService:
             if not UserService.validate_role(update_data['role']):
                 raise ValueError("Invalid role")
         
-        # Update user
-        response = supabase.table('users').update(update_data).eq('id', user_id).execute()
+        # Nothing left to write (e.g., only id/created_at were sent): skip the no-op UPDATE
+        if not update_data:
+            user = UserService.get_user_by_id(user_id)
+            if not user:
+                raise Exception("User not found or update failed")
+            return user
+        
+        # Update user, returning the row without password_hash
+        supabase = SupabaseClient.get_client()
+        response = _returning(
+            supabase.table('users').update(update_data).eq('id', user_id), USER_COLUMNS
+        ).execute()
+        _invalidate(user_id)
         
-        if not response.data or len(response.data) == 0:
+        data = response.data
+        if not data:
             raise Exception("User not found or update failed")
         
-        user = response.data[0]
-        user.pop('password_hash', None)
+        return data[0]
+    
+    @staticmethod
+    def update_password_hash(user_id: int, password_hash: str):
+        """
+        Replace a user's stored password hash.
         
-        return user
+        Args:
+            user_id: User ID
+            password_hash: New password hash
+        """
+        supabase = SupabaseClient.get_client()
+        supabase.table('users').update({'password_hash': password_hash}).eq('id', user_id).execute()
+        _invalidate(user_id)
     
     @staticmethod
     def toggle_user_active(user_id: int, is_active: bool) -> dict:
         """
         Activate or deactivate a user.
         
+        The row is not sent back by the database (return=minimal); only
+        the number of matched rows is, to detect a missing user.
+        
         Args:
             user_id: User ID
             is_active: True to activate, False to deactivate
             
         Returns:
-            dict: Updated user data
+            dict: The user's ID and new is_active flag
         """
         supabase = SupabaseClient.get_client()
-        response = supabase.table('users').update({'is_active': is_active}).eq('id', user_id).execute()
+        response = supabase.table('users').update(
+            {'is_active': is_active}, count='exact', returning='minimal'
+        ).eq('id', user_id).execute()
+        _invalidate(user_id)
         
-        if not response.data or len(response.data) == 0:
+        if not response.count:
             raise Exception("User not found")
         
-        user = response.data[0]
-        user.pop('password_hash', None)
-        
-        return user
-
+        return {'id': user_id, 'is_active': is_active}
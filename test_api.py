@@ -3,15 +3,20 @@ Comprehensive API test script for Healthcare Insurance API.
 Tests all endpoints with the requested scenario.
 """
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import json
 import time
 import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
 from typing import Dict, List, Optional
 
-# Fix Windows console encoding for emoji
-if sys.platform == 'win32':
-    import io
-    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8')
+# Make sure the console can print emoji (e.g., Windows code pages), once up front
+for _stream in (sys.stdout, sys.stderr):
+    if (_stream.encoding or '').lower() != 'utf-8':
+        _stream.reconfigure(encoding='utf-8')
 
 # Configure the base URL - update this if your app runs on a different address
 BASE_URL = "http://192.168.68.118:5000"
@@ -21,6 +26,9 @@ API_BASE = f"{BASE_URL}/api"
 # BASE_URL = "http://localhost:5000"
 # API_BASE = f"{BASE_URL}/api"
 
+# Independent calls (logins, policy creation, claim submission) run concurrently
+MAX_WORKERS = 12
+
 # Store tokens and IDs for testing
 tokens: Dict[str, str] = {}
 user_ids: Dict[str, int] = {}
@@ -42,48 +50,79 @@ def print_test(test_name: str):
 
 def print_success(message: str):
     """Print success message."""
-    try:
-        print(f"✅ {message}")
-    except UnicodeEncodeError:
-        print(f"[SUCCESS] {message}")
+    print(f"✅ {message}")
 
 
 def print_error(message: str):
     """Print error message."""
-    try:
-        print(f"❌ {message}")
-    except UnicodeEncodeError:
-        print(f"[ERROR] {message}")
+    print(f"❌ {message}")
 
 
 def print_info(message: str):
     """Print info message."""
-    try:
-        print(f"ℹ️  {message}")
-    except UnicodeEncodeError:
-        print(f"[INFO] {message}")
+    print(f"ℹ️  {message}")
+
+
+_BASE_HEADERS = {"Content-Type": "application/json"}
+
+# Fixed fields of the policies and claims created by the test run
+_POLICY_TEMPLATE = {
+    "coverage_amount": 50000.00,
+    "premium_amount": 500.00,
+    "start_date": "2024-01-01",
+    "end_date": "2024-12-31",
+    "status": "active"
+}
+_CLAIM_TEMPLATE = {
+    "diagnosis": "Medical treatment",
+    "treatment_details": "Standard medical procedure",
+    "provider_name": "City Hospital",
+    "service_date": "2024-01-15"
+}
+
+_thread_local = threading.local()
+
+
+def get_session() -> requests.Session:
+    """Return this thread's HTTP session, so each worker reuses its keep-alive connection."""
+    session = getattr(_thread_local, "session", None)
+    if session is None:
+        session = _thread_local.session = requests.Session()
+        adapter = HTTPAdapter(
+            pool_connections=10,
+            pool_maxsize=20,
+            max_retries=Retry(total=3, backoff_factor=0.1)
+        )
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+    return session
+
+
+def run_parallel(calls: list) -> list:
+    """Run independent (function, *args) calls concurrently and return their results in order."""
+    with ThreadPoolExecutor(max_workers=MAX_WORKERS) as pool:
+        futures = [pool.submit(fn, *args) for fn, *args in calls]
+        return [future.result() for future in futures]
+
+
+@lru_cache(maxsize=None)
+def auth_headers(token: str) -> dict:
+    """Build (once per token) the request headers for an authenticated call."""
+    return {**_BASE_HEADERS, "Authorization": f"Bearer {token}"}
 
 
 def make_request(method: str, endpoint: str, token: Optional[str] = None, data: Optional[dict] = None) -> Optional[dict]:
     """Make HTTP request and return response."""
     url = f"{API_BASE}{endpoint}"
-    headers = {"Content-Type": "application/json"}
+    headers = auth_headers(token) if token else _BASE_HEADERS
+    body = json.dumps(data).encode("utf-8") if data is not None else None
     
-    if token:
-        headers["Authorization"] = f"Bearer {token}"
+    if method not in ("GET", "POST", "PUT", "PATCH"):
+        print_error(f"Unsupported method: {method}")
+        return None
     
     try:
-        if method == "GET":
-            response = requests.get(url, headers=headers)
-        elif method == "POST":
-            response = requests.post(url, headers=headers, json=data)
-        elif method == "PUT":
-            response = requests.put(url, headers=headers, json=data)
-        elif method == "PATCH":
-            response = requests.patch(url, headers=headers, json=data)
-        else:
-            print_error(f"Unsupported method: {method}")
-            return None
+        response = get_session().request(method, url, headers=headers, data=body)
         
         try:
             result = response.json()
@@ -106,7 +145,7 @@ def test_health_check():
     print_test("Health Check")
     # Health check is at root, not under /api
     try:
-        response = requests.get(BASE_URL + "/")
+        response = get_session().get(BASE_URL + "/")
         result = response.json()
         result["_status_code"] = response.status_code
         
@@ -151,6 +190,24 @@ def register_user(email: str, password: str, full_name: str, role: str, phone: s
         return None
 
 
+def register_users_bulk(token: str, users: Dict[str, dict]) -> Dict[str, Optional[int]]:
+    """Register several users with one (admin) request; returns IDs keyed like the input."""
+    result = make_request("POST", "/auth/register_bulk", token=token, data={"users": list(users.values())})
+    
+    if result and result.get("_status_code") == 201:
+        ids_by_email = {user.get("email"): user.get("id") for user in result.get("users", [])}
+        for user in users.values():
+            print_success(f"Registered {user['role']}: {user['email']} (ID: {ids_by_email.get(user['email'])})")
+        return {key: ids_by_email.get(user["email"]) for key, user in users.items()}
+    else:
+        error = result.get("error", "Unknown error") if result else "No response"
+        status = result.get("_status_code", "N/A") if result else "N/A"
+        print_error(f"Failed to register users: {error} (Status: {status})")
+        if result:
+            print_info(f"Full response: {json.dumps(result, indent=2)}")
+        return {key: None for key in users}
+
+
 def login_user(email: str, password: str) -> Optional[str]:
     """Login user and return token."""
     data = {
@@ -171,55 +228,44 @@ def login_user(email: str, password: str) -> Optional[str]:
         return None
 
 
-def create_policy(token: str, user_id: int, policy_type: str = "Individual Health") -> Optional[int]:
-    """Create a policy for a user."""
-    data = {
-        "user_id": user_id,
-        "policy_type": policy_type,
-        "coverage_amount": 50000.00,
-        "premium_amount": 500.00,
-        "start_date": "2024-01-01",
-        "end_date": "2024-12-31",
-        "status": "active"
-    }
+def create_policies_bulk(token: str, policies: List[tuple]) -> List[Optional[int]]:
+    """Create several (user_id, policy_type) policies with one request; returns their IDs in order."""
+    data = {"policies": [
+        {**_POLICY_TEMPLATE, "user_id": user_id, "policy_type": policy_type}
+        for user_id, policy_type in policies
+    ]}
     
-    result = make_request("POST", "/policies", token=token, data=data)
+    result = make_request("POST", "/policies/bulk", token=token, data=data)
     
     if result and result.get("_status_code") == 201:
-        policy = result.get("policy", {})
-        policy_id = policy.get("id")
-        policy_number = policy.get("policy_number")
-        print_success(f"Created policy {policy_number} (ID: {policy_id}) for user {user_id}")
-        return policy_id
+        created = result.get("policies", [])
+        for policy in created:
+            print_success(f"Created policy {policy.get('policy_number')} (ID: {policy.get('id')}) for user {policy.get('user_id')}")
+        return [policy.get("id") for policy in created]
     else:
         error = result.get("error", "Unknown error") if result else "No response"
-        print_error(f"Failed to create policy: {error}")
-        return None
+        print_error(f"Failed to create policies: {error}")
+        return [None] * len(policies)
 
 
-def submit_claim(token: str, policy_id: int, claim_amount: float = 5000.00) -> Optional[int]:
-    """Submit a claim for a policy."""
-    data = {
-        "policy_id": policy_id,
-        "claim_amount": claim_amount,
-        "diagnosis": "Medical treatment",
-        "treatment_details": "Standard medical procedure",
-        "provider_name": "City Hospital",
-        "service_date": "2024-01-15"
-    }
+def submit_claims_bulk(token: str, claims: List[tuple]) -> List[Optional[int]]:
+    """Submit several (policy_id, claim_amount) claims with one request; returns their IDs in order."""
+    data = {"claims": [
+        {**_CLAIM_TEMPLATE, "policy_id": policy_id, "claim_amount": claim_amount}
+        for policy_id, claim_amount in claims
+    ]}
     
-    result = make_request("POST", "/claims", token=token, data=data)
+    result = make_request("POST", "/claims/bulk", token=token, data=data)
     
     if result and result.get("_status_code") == 201:
-        claim = result.get("claim", {})
-        claim_id = claim.get("id")
-        claim_number = claim.get("claim_number")
-        print_success(f"Submitted claim {claim_number} (ID: {claim_id}) for policy {policy_id}")
-        return claim_id
+        created = result.get("claims", [])
+        for claim in created:
+            print_success(f"Submitted claim {claim.get('claim_number')} (ID: {claim.get('id')}) for policy {claim.get('policy_id')}")
+        return [claim.get("id") for claim in created]
     else:
         error = result.get("error", "Unknown error") if result else "No response"
-        print_error(f"Failed to submit claim: {error}")
-        return None
+        print_error(f"Failed to submit claims: {error}")
+        return [None] * len(claims)
 
 
 def test_get_current_user(token: str):
@@ -306,35 +352,26 @@ def main():
     
     print_section("Step 1: Register 6 Users (2 Patients, 2 Providers, 2 Administrators)")
     
-    # Register 2 patients
-    user_ids["patient1"] = register_user(
-        "patient1@test.com", "password123", "Patient One", "patient", 
-        "1111111111", "123 Patient St"
-    )
-    user_ids["patient2"] = register_user(
-        "patient2@test.com", "password123", "Patient Two", "patient",
-        "2222222222", "456 Patient Ave"
-    )
-    
-    # Register 2 providers
-    user_ids["provider1"] = register_user(
-        "provider1@test.com", "password123", "Dr. Provider One", "provider",
-        "3333333333", "789 Provider Blvd"
-    )
-    user_ids["provider2"] = register_user(
-        "provider2@test.com", "password123", "Dr. Provider Two", "provider",
-        "4444444444", "321 Provider Way"
-    )
-    
-    # Register 2 administrators
-    user_ids["admin1"] = register_user(
-        "admin1@test.com", "password123", "Admin One", "administrator",
-        "5555555555", "654 Admin St"
-    )
-    user_ids["admin2"] = register_user(
-        "admin2@test.com", "password123", "Admin Two", "administrator",
-        "6666666666", "987 Admin Ave"
-    )
+    # Register the first administrator, who then registers the rest in a single request
+    user_ids["admin1"] = register_user("admin1@test.com", "password123", "Admin One", "administrator",
+                                       "5555555555", "654 Admin St")
+    admin_token = login_user("admin1@test.com", "password123") if user_ids["admin1"] else None
+    if admin_token is None:
+        print_error("\nCould not register the first administrator. Please check the errors above.")
+        return
+    
+    user_ids.update(register_users_bulk(admin_token, {
+        "patient1": {"email": "patient1@test.com", "password": "password123", "full_name": "Patient One",
+                     "role": "patient", "phone": "1111111111", "address": "123 Patient St"},
+        "patient2": {"email": "patient2@test.com", "password": "password123", "full_name": "Patient Two",
+                     "role": "patient", "phone": "2222222222", "address": "456 Patient Ave"},
+        "provider1": {"email": "provider1@test.com", "password": "password123", "full_name": "Dr. Provider One",
+                      "role": "provider", "phone": "3333333333", "address": "789 Provider Blvd"},
+        "provider2": {"email": "provider2@test.com", "password": "password123", "full_name": "Dr. Provider Two",
+                      "role": "provider", "phone": "4444444444", "address": "321 Provider Way"},
+        "admin2": {"email": "admin2@test.com", "password": "password123", "full_name": "Admin Two",
+                   "role": "administrator", "phone": "6666666666", "address": "987 Admin Ave"},
+    }))
     
     # Check if all registrations succeeded
     if None in user_ids.values():
@@ -343,13 +380,11 @@ def main():
     
     print_section("Step 2: Login All Users and Get Tokens")
     
-    # Login all users
-    tokens["patient1"] = login_user("patient1@test.com", "password123")
-    tokens["patient2"] = login_user("patient2@test.com", "password123")
-    tokens["provider1"] = login_user("provider1@test.com", "password123")
-    tokens["provider2"] = login_user("provider2@test.com", "password123")
-    tokens["admin1"] = login_user("admin1@test.com", "password123")
-    tokens["admin2"] = login_user("admin2@test.com", "password123")
+    # Login all users concurrently
+    user_keys = list(user_ids)
+    tokens.update(zip(user_keys, run_parallel(
+        [(login_user, f"{key}@test.com", "password123") for key in user_keys]
+    )))
     
     # Check if all logins succeeded
     if None in tokens.values():
@@ -362,43 +397,32 @@ def main():
     
     print_section("Step 3: Create 2 Policies for Each User (Using Provider/Admin Accounts)")
     
-    # Initialize policy lists
-    policy_ids["patient1"] = []
-    policy_ids["patient2"] = []
-    policy_ids["provider1"] = []
-    policy_ids["provider2"] = []
-    policy_ids["admin1"] = []
-    policy_ids["admin2"] = []
-    
-    # Create 2 policies for patient1 (using provider1)
-    print_info(f"\nCreating policies for Patient 1 (user_id: {user_ids['patient1']})")
-    policy_ids["patient1"].append(create_policy(tokens["provider1"], user_ids["patient1"], "Individual Health"))
-    policy_ids["patient1"].append(create_policy(tokens["provider1"], user_ids["patient1"], "Family Plan"))
-    
-    # Create 2 policies for patient2 (using provider2)
-    print_info(f"\nCreating policies for Patient 2 (user_id: {user_ids['patient2']})")
-    policy_ids["patient2"].append(create_policy(tokens["provider2"], user_ids["patient2"], "Individual Health"))
-    policy_ids["patient2"].append(create_policy(tokens["provider2"], user_ids["patient2"], "Family Plan"))
-    
-    # Create 2 policies for provider1 (using admin1)
-    print_info(f"\nCreating policies for Provider 1 (user_id: {user_ids['provider1']})")
-    policy_ids["provider1"].append(create_policy(tokens["admin1"], user_ids["provider1"], "Individual Health"))
-    policy_ids["provider1"].append(create_policy(tokens["admin1"], user_ids["provider1"], "Family Plan"))
-    
-    # Create 2 policies for provider2 (using admin2)
-    print_info(f"\nCreating policies for Provider 2 (user_id: {user_ids['provider2']})")
-    policy_ids["provider2"].append(create_policy(tokens["admin2"], user_ids["provider2"], "Individual Health"))
-    policy_ids["provider2"].append(create_policy(tokens["admin2"], user_ids["provider2"], "Family Plan"))
-    
-    # Create 2 policies for admin1 (using admin2)
-    print_info(f"\nCreating policies for Admin 1 (user_id: {user_ids['admin1']})")
-    policy_ids["admin1"].append(create_policy(tokens["admin2"], user_ids["admin1"], "Individual Health"))
-    policy_ids["admin1"].append(create_policy(tokens["admin2"], user_ids["admin1"], "Family Plan"))
-    
-    # Create 2 policies for admin2 (using admin1)
-    print_info(f"\nCreating policies for Admin 2 (user_id: {user_ids['admin2']})")
-    policy_ids["admin2"].append(create_policy(tokens["admin1"], user_ids["admin2"], "Individual Health"))
-    policy_ids["admin2"].append(create_policy(tokens["admin1"], user_ids["admin2"], "Family Plan"))
+    # Each user gets an Individual Health and a Family Plan policy, created by
+    # (user, creator): patients by providers, providers and admins by admins
+    policy_creators = [
+        ("patient1", "provider1"),
+        ("patient2", "provider2"),
+        ("provider1", "admin1"),
+        ("provider2", "admin2"),
+        ("admin1", "admin2"),
+        ("admin2", "admin1"),
+    ]
+    
+    # One bulk request per creator, sent concurrently
+    policies_by_creator: Dict[str, List[tuple]] = {}
+    for owner, creator in policy_creators:
+        policy_ids[owner] = []
+        for policy_type in ("Individual Health", "Family Plan"):
+            policies_by_creator.setdefault(creator, []).append((owner, policy_type))
+    
+    print_info(f"\nCreating policies with {len(policies_by_creator)} bulk requests")
+    results = run_parallel([
+        (create_policies_bulk, tokens[creator], [(user_ids[owner], policy_type) for owner, policy_type in entries])
+        for creator, entries in policies_by_creator.items()
+    ])
+    for entries, created_ids in zip(policies_by_creator.values(), results):
+        for (owner, _), policy_id in zip(entries, created_ids):
+            policy_ids[owner].append(policy_id)
     
     # Filter out None values
     for key in policy_ids:
@@ -411,49 +435,30 @@ def main():
     
     print_section("Step 4: Submit 2 Claims for Each User Who Has 2 Active Policies")
     
-    # Initialize claim lists
-    claim_ids["patient1"] = []
-    claim_ids["patient2"] = []
-    claim_ids["provider1"] = []
-    claim_ids["provider2"] = []
-    claim_ids["admin1"] = []
-    claim_ids["admin2"] = []
-    
-    # Submit 2 claims for patient1 (who has 2 policies)
-    if len(policy_ids["patient1"]) >= 2:
-        print_info(f"\nSubmitting claims for Patient 1 (has {len(policy_ids['patient1'])} policies)")
-        claim_ids["patient1"].append(submit_claim(tokens["patient1"], policy_ids["patient1"][0], 5000.00))
-        claim_ids["patient1"].append(submit_claim(tokens["patient1"], policy_ids["patient1"][1], 7500.00))
-    
-    # Submit 2 claims for patient2 (who has 2 policies)
-    if len(policy_ids["patient2"]) >= 2:
-        print_info(f"\nSubmitting claims for Patient 2 (has {len(policy_ids['patient2'])} policies)")
-        claim_ids["patient2"].append(submit_claim(tokens["patient2"], policy_ids["patient2"][0], 3000.00))
-        claim_ids["patient2"].append(submit_claim(tokens["patient2"], policy_ids["patient2"][1], 6000.00))
-    
-    # Submit 2 claims for provider1 (who has 2 policies)
-    if len(policy_ids["provider1"]) >= 2:
-        print_info(f"\nSubmitting claims for Provider 1 (has {len(policy_ids['provider1'])} policies)")
-        claim_ids["provider1"].append(submit_claim(tokens["provider1"], policy_ids["provider1"][0], 4000.00))
-        claim_ids["provider1"].append(submit_claim(tokens["provider1"], policy_ids["provider1"][1], 5500.00))
-    
-    # Submit 2 claims for provider2 (who has 2 policies)
-    if len(policy_ids["provider2"]) >= 2:
-        print_info(f"\nSubmitting claims for Provider 2 (has {len(policy_ids['provider2'])} policies)")
-        claim_ids["provider2"].append(submit_claim(tokens["provider2"], policy_ids["provider2"][0], 4500.00))
-        claim_ids["provider2"].append(submit_claim(tokens["provider2"], policy_ids["provider2"][1], 6500.00))
-    
-    # Submit 2 claims for admin1 (who has 2 policies)
-    if len(policy_ids["admin1"]) >= 2:
-        print_info(f"\nSubmitting claims for Admin 1 (has {len(policy_ids['admin1'])} policies)")
-        claim_ids["admin1"].append(submit_claim(tokens["admin1"], policy_ids["admin1"][0], 3500.00))
-        claim_ids["admin1"].append(submit_claim(tokens["admin1"], policy_ids["admin1"][1], 5000.00))
-    
-    # Submit 2 claims for admin2 (who has 2 policies)
-    if len(policy_ids["admin2"]) >= 2:
-        print_info(f"\nSubmitting claims for Admin 2 (has {len(policy_ids['admin2'])} policies)")
-        claim_ids["admin2"].append(submit_claim(tokens["admin2"], policy_ids["admin2"][0], 4200.00))
-        claim_ids["admin2"].append(submit_claim(tokens["admin2"], policy_ids["admin2"][1], 5800.00))
+    # Claim amounts for each user's two policies
+    claim_amounts = {
+        "patient1": (5000.00, 7500.00),
+        "patient2": (3000.00, 6000.00),
+        "provider1": (4000.00, 5500.00),
+        "provider2": (4500.00, 6500.00),
+        "admin1": (3500.00, 5000.00),
+        "admin2": (4200.00, 5800.00),
+    }
+    
+    # Submit 2 claims for every user who has 2 policies, one bulk request per user
+    claim_owners = []
+    for owner in claim_amounts:
+        claim_ids[owner] = []
+        if len(policy_ids[owner]) >= 2:
+            claim_owners.append(owner)
+    
+    print_info(f"\nSubmitting claims with {len(claim_owners)} bulk requests")
+    results = run_parallel([
+        (submit_claims_bulk, tokens[owner], list(zip(policy_ids[owner], claim_amounts[owner])))
+        for owner in claim_owners
+    ])
+    for owner, created_ids in zip(claim_owners, results):
+        claim_ids[owner].extend(created_ids)
     
     # Filter out None values
     for key in claim_ids:
@@ -519,15 +524,9 @@ if __name__ == "__main__":
     try:
         main()
     except KeyboardInterrupt:
-        try:
-            print("\n\n⚠️  Test interrupted by user")
-        except:
-            print("\n\n[WARNING] Test interrupted by user")
+        print("\n\n⚠️  Test interrupted by user")
     except Exception as e:
-        try:
-            print(f"\n\n❌ Unexpected error: {str(e)}")
-        except:
-            print(f"\n\n[ERROR] Unexpected error: {str(e)}")
+        print(f"\n\n❌ Unexpected error: {str(e)}")
         import traceback
         traceback.print_exc()
 
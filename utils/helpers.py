@@ -1,100 +1,368 @@
 """
-Utility decorators for authentication and authorization.
+Utility decorators for authentication and authorization, and request helpers.
 """
+import hashlib
+import time
 from functools import wraps
-from flask import request, jsonify
+from flask import g, request, jsonify
+import httpx
 import jwt
+from jwt.algorithms import get_default_algorithms
+from postgrest.exceptions import APIError
 from config import Config
-from services.supabase_client import SupabaseClient
+from services.user_service import UserService
+from utils.cache import TTLCache
+from utils.serialization import from_json, raw_json_response, to_json
 
 
-def require_auth(f):
+def _prepare_verification_key(key: str, algorithm: str):
     """
-    Decorator to require JWT authentication.
+    Parse the JWT verification key once for the configured algorithm.
     
-    Extracts and validates JWT token from Authorization header.
-    Adds 'current_user' to the decorated function's kwargs.
+    PyJWT otherwise re-parses the key material (e.g. a PEM public key) on
+    every decode. The raw key is returned when the algorithm is unavailable
+    or the key cannot be parsed, leaving PyJWT to report it at decode time.
+    
+    Args:
+        key: Secret or public key from the configuration
+        algorithm: JWT signing algorithm name
+        
+    Returns:
+        Prepared key accepted by jwt.decode
+    """
+    algorithm_impl = get_default_algorithms().get(algorithm)
+    if algorithm_impl is None:
+        return key
+    try:
+        return algorithm_impl.prepare_key(key)
+    except (jwt.InvalidKeyError, ValueError, TypeError):
+        return key
+
+
+# JWT verification settings, resolved once at import
+_JWT_ALGORITHMS = (Config.JWT_ALGORITHM,)
+_JWT_KEY = _prepare_verification_key(Config.JWT_SECRET_KEY, Config.JWT_ALGORITHM)
+
+# Recently verified JWT payloads, keyed by a hash of the token. Entries live
+# for up to 5 minutes but never past the token's own exp; failed validations
+# are not cached.
+_jwt_cache = TTLCache(maxsize=10_000, ttl=300)
+
+# Recently rejected tokens and the error they were rejected with, so a
+# replayed bad token is refused without decoding it again. Kept small so
+# floods of distinct tokens cannot grow it without bound.
+_bad_token_cache = TTLCache(maxsize=2048, ttl=60)
+
+# Authentication failure bodies, serialized once (these paths absorb
+# traffic from expired and forged tokens)
+_INVALID_HEADER_BODY = to_json({'error': 'Invalid authorization header format'})
+_MISSING_TOKEN_BODY = to_json({'error': 'Authorization token is missing'})
+_INVALID_PAYLOAD_BODY = to_json({'error': 'Invalid token payload'})
+_USER_NOT_FOUND_BODY = to_json({'error': 'User not found'})
+_DEACTIVATED_BODY = to_json({'error': 'User account is deactivated'})
+_EXPIRED_TOKEN_BODY = to_json({'error': 'Token has expired'})
+_INVALID_TOKEN_BODY = to_json({'error': 'Invalid token'})
+
+# Page sizes for list endpoints
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+
+
+def _decode_token(token: str) -> dict:
     """
-    @wraps(f)
-    def decorated_function(*args, **kwargs):
-        token = None
+    Decode and verify a JWT, reusing recently verified payloads.
+    
+    Args:
+        token: Encoded JWT
         
-        # Get token from Authorization header
-        auth_header = request.headers.get('Authorization')
-        if auth_header:
-            try:
-                token = auth_header.split(' ')[1]  # Format: "Bearer <token>"
-            except IndexError:
-                return jsonify({'error': 'Invalid authorization header format'}), 401
+    Returns:
+        dict: Token payload
         
-        if not token:
-            return jsonify({'error': 'Authorization token is missing'}), 401
+    Raises:
+        jwt.InvalidTokenError: If the token is invalid or expired
+    """
+    key = hashlib.blake2b(token.encode('utf-8'), digest_size=16).digest()
+    payload = _jwt_cache.get(key)
+    if payload is None:
+        error_class = _bad_token_cache.get(key)
+        if error_class is not None:
+            raise error_class('Token was recently rejected')
         
         try:
-            # Decode and verify token
-            payload = jwt.decode(token, Config.JWT_SECRET_KEY, algorithms=[Config.JWT_ALGORITHM])
-            user_id = payload.get('user_id')
-            
-            if not user_id:
-                return jsonify({'error': 'Invalid token payload'}), 401
-            
-            # Fetch user from database
-            supabase = SupabaseClient.get_client()
-            response = supabase.table('users').select('*').eq('id', user_id).execute()
-            
-            if not response.data or len(response.data) == 0:
-                return jsonify({'error': 'User not found'}), 401
-            
-            user = response.data[0]
+            # Expired tokens are rejected from their unverified claims without
+            # paying for signature verification
+            claims = jwt.decode(token, options={'verify_signature': False})
+            exp = claims.get('exp')
+            if isinstance(exp, (int, float)) and exp <= time.time():
+                raise jwt.ExpiredSignatureError('Signature has expired')
             
-            # Check if user is active
-            if not user.get('is_active', True):
-                return jsonify({'error': 'User account is deactivated'}), 403
-            
-            # Add current_user to kwargs
-            kwargs['current_user'] = user
-            
-        except jwt.ExpiredSignatureError:
-            return jsonify({'error': 'Token has expired'}), 401
-        except jwt.InvalidTokenError:
-            return jsonify({'error': 'Invalid token'}), 401
-        except Exception as e:
-            return jsonify({'error': f'Authentication error: {str(e)}'}), 401
+            payload = jwt.decode(token, _JWT_KEY, algorithms=_JWT_ALGORITHMS)
+        except jwt.InvalidTokenError as e:
+            _bad_token_cache.set(key, type(e))
+            raise
+        
+        ttl = _jwt_cache.ttl
+        if 'exp' in payload:
+            # Never serve a cached payload past the token's own expiry
+            ttl = min(ttl, payload['exp'] - time.time())
+        _jwt_cache.set(key, payload, ttl)
+    return payload
+
+
+def get_json_body():
+    """
+    Parse the request body as JSON.
+    
+    Decodes the raw body bytes directly instead of going through
+    request.get_json(), which builds an intermediate str first.
+    
+    Returns:
+        The decoded JSON body
+        
+    Raises:
+        ValueError: If the body is not valid JSON
+    """
+    try:
+        return from_json(request.get_data(cache=False))
+    except ValueError:
+        raise ValueError('Request body must be valid JSON') from None
+
+
+def get_required_json_body():
+    """
+    Parse a JSON request body that must be present and non-empty.
+    
+    Requests declaring an empty body are rejected before anything is
+    read or parsed.
+    
+    Returns:
+        The decoded JSON body
         
-        return f(*args, **kwargs)
+    Raises:
+        ValueError: If the body is missing, empty or not valid JSON
+    """
+    if request.content_length == 0:
+        raise ValueError('No data provided')
     
-    return decorated_function
+    data = get_json_body()
+    if not data:
+        raise ValueError('No data provided')
+    return data
 
 
-def require_role(allowed_roles):
+def get_bulk_json_items(key: str, item_name: str, max_items: int, verb: str) -> list:
     """
-    Decorator to require specific user roles.
+    Read the list of objects posted to a bulk endpoint.
+    
+    The body must be a JSON object whose key field holds a non-empty list of
+    at most max_items objects.
     
     Args:
-        allowed_roles: List of allowed roles (e.g., ['administrator', 'provider'])
+        key: Name of the list field (e.g., 'claims')
+        item_name: Singular name used in error messages (e.g., 'claim')
+        max_items: Largest number of items accepted
+        verb: Past participle for the size error (e.g., 'submitted')
+        
+    Returns:
+        list: The posted items
+        
+    Raises:
+        ValueError: If the body or the list is missing or malformed
+    """
+    data = get_required_json_body()
+    
+    items = data.get(key) if isinstance(data, dict) else None
+    if not isinstance(items, list) or not items:
+        raise ValueError(f'{key} must be a non-empty list')
+    if len(items) > max_items:
+        raise ValueError(f'At most {max_items} {key} can be {verb} at once')
+    if not all(isinstance(item, dict) for item in items):
+        raise ValueError(f'Each {item_name} must be an object')
+    return items
+
+
+def _int_query_arg(name: str, default: int = None) -> int:
+    """Read an integer query parameter, rejecting values that are not integers."""
+    value = request.args.get(name)
+    if value is None:
+        return default
+    try:
+        return int(value)
+    except ValueError:
+        raise ValueError(f'{name} must be an integer') from None
+
+
+def get_pagination_args() -> tuple[int, int, int]:
+    """
+    Read list pagination parameters from the query string.
     
-    Must be used after @require_auth decorator.
+    Query parameters:
+        - limit: Page size (default 100, at most 1000)
+        - offset: Number of records to skip
+        - after_id: ID of the last record of the previous page
+    
+    Returns:
+        tuple: (limit, offset, after_id), with after_id None when not given
+        
+    Raises:
+        ValueError: If a parameter is not an integer or is out of range
     """
+    limit = _int_query_arg('limit', DEFAULT_PAGE_SIZE)
+    offset = _int_query_arg('offset', 0)
+    after_id = _int_query_arg('after_id')
+    
+    if not 1 <= limit <= MAX_PAGE_SIZE:
+        raise ValueError(f'limit must be between 1 and {MAX_PAGE_SIZE}')
+    if offset < 0:
+        raise ValueError('offset cannot be negative')
+    
+    return limit, offset, after_id
+
+
+def _insufficient_permissions_prefix(roles) -> bytes:
+    """
+    Serialize the fixed part of a view's 403 body once.
+    
+    Args:
+        roles: Roles allowed by the view
+        
+    Returns:
+        bytes: The body up to the user's role, which is appended per response
+    """
+    body = to_json({'error': 'Insufficient permissions', 'required_roles': list(roles)})
+    return body[:-1] + b',"user_role":'
+
+
+def _insufficient_permissions(body_prefix: bytes, user_role: str):
+    """Build the 403 response for a user whose role is not allowed."""
+    return raw_json_response(body_prefix + to_json(user_role) + b'}', 403)
+
+
+def _authenticate(allowed: frozenset, forbidden_prefix: bytes) -> tuple:
+    """
+    Authenticate the current request from its Authorization header.
+    
+    Args:
+        allowed: Roles allowed by the token's role claim, or None for any
+        forbidden_prefix: Serialized start of the 403 body for the view
+        
+    Returns:
+        tuple: (user, None) on success, or (None, error response)
+    """
+    token = None
+    
+    # Get token from Authorization header
+    auth_header = request.headers.get('Authorization')
+    if auth_header:
+        # Format: "Bearer <token>"
+        if not auth_header.startswith('Bearer '):
+            return None, raw_json_response(_INVALID_HEADER_BODY, 401)
+        token = auth_header[7:]
+    
+    if not token:
+        return None, raw_json_response(_MISSING_TOKEN_BODY, 401)
+    
+    try:
+        # Decode and verify token
+        payload = _decode_token(token)
+        user_id = payload.get('user_id')
+        
+        if not user_id:
+            return None, raw_json_response(_INVALID_PAYLOAD_BODY, 401)
+        
+        # Fail fast on the role claim. Only an allowed claim is re-checked
+        # against the users table, so a demotion applies at once but a
+        # promotion needs a new token (the old claim keeps being refused)
+        if allowed is not None and payload.get('role') not in allowed:
+            return None, _insufficient_permissions(forbidden_prefix, payload.get('role'))
+        
+        # Fetch user (cached for a short time)
+        user = UserService.get_user_by_id(user_id)
+        
+        if not user:
+            return None, raw_json_response(_USER_NOT_FOUND_BODY, 401)
+        
+        # Check if user is active
+        if not user.get('is_active', True):
+            return None, raw_json_response(_DEACTIVATED_BODY, 403)
+        
+    except jwt.ExpiredSignatureError:
+        return None, raw_json_response(_EXPIRED_TOKEN_BODY, 401)
+    except jwt.InvalidTokenError:
+        return None, raw_json_response(_INVALID_TOKEN_BODY, 401)
+    except (APIError, httpx.HTTPError) as e:
+        # The user lookup failed; anything else is left to the 500 handler
+        return None, (jsonify({'error': f'Authentication error: {str(e)}'}), 401)
+    
+    return user, None
+
+
+def auth(roles=None):
+    """
+    Decorator to require JWT authentication and, optionally, specific roles.
+    
+    Extracts and validates the JWT from the Authorization header, loads the
+    user and checks their role in a single wrapper. The user is kept on
+    flask.g for the rest of the request and added as 'current_user' to the
+    decorated function's kwargs.
+    
+    Args:
+        roles: Iterable of allowed roles (e.g., ['administrator', 'provider']),
+            or None to allow any authenticated user
+    """
+    # Built once per decorated view rather than on every request
+    allowed = frozenset(roles) if roles is not None else None
+    forbidden_prefix = _insufficient_permissions_prefix(roles) if roles is not None else None
+    
     def decorator(f):
         @wraps(f)
         def decorated_function(*args, **kwargs):
-            # Get current_user from kwargs (set by @require_auth)
-            current_user = kwargs.get('current_user')
-            
-            if not current_user:
-                return jsonify({'error': 'Authentication required'}), 401
-            
-            user_role = current_user.get('role')
+            # Authenticate at most once per request
+            user = g.get('current_user')
+            if user is None:
+                user, error = _authenticate(allowed, forbidden_prefix)
+                if error is not None:
+                    return error
+                g.current_user = user
             
-            if user_role not in allowed_roles:
-                return jsonify({
-                    'error': 'Insufficient permissions',
-                    'required_roles': allowed_roles,
-                    'user_role': user_role
-                }), 403
+            if allowed is not None and user['role'] not in allowed:
+                return _insufficient_permissions(forbidden_prefix, user['role'])
             
+            # Add current_user to kwargs
+            kwargs['current_user'] = user
             return f(*args, **kwargs)
         
+        # Lets require_auth/require_role recognise an already protected view
+        decorated_function._auth_view = f
         return decorated_function
     return decorator
 
+
+def require_auth(f):
+    """
+    Decorator to require JWT authentication.
+    
+    Equivalent to @auth(). A view already protected by @require_role is
+    returned unchanged, so the usual stacking adds a single wrapper.
+    """
+    if hasattr(f, '_auth_view'):
+        return f
+    return auth()(f)
+
+
+def require_role(allowed_roles):
+    """
+    Decorator to require specific user roles.
+    
+    Equivalent to @auth(roles=allowed_roles); authenticates the request on
+    its own, so stacking it under @require_auth adds no second wrapper.
+    
+    Args:
+        allowed_roles: Iterable of allowed roles (e.g., ['administrator', 'provider'])
+    """
+    check = auth(allowed_roles)
+    
+    def decorator(f):
+        # Replace the wrapper of a view already protected by @require_auth
+        return check(getattr(f, '_auth_view', f))
+    return decorator
@@ -0,0 +1,138 @@
+"""
+JSON serialization helpers backed by orjson.
+
+orjson has no PyPy build, so on interpreters without it the helpers fall
+back to the standard library json module (which PyPy's JIT handles well).
+"""
+import datetime
+import decimal
+import json
+import uuid
+from flask import current_app
+from flask.json.provider import JSONProvider
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Target size of each chunk written by streamed responses
+_STREAM_CHUNK_SIZE = 64 * 1024
+
+
+def _default(obj):
+    """Serialize types the JSON encoder does not handle natively."""
+    if isinstance(obj, (decimal.Decimal, uuid.UUID)):
+        return str(obj)
+    if isinstance(obj, (datetime.date, datetime.time)):
+        return obj.isoformat()
+    if isinstance(obj, (set, frozenset)):
+        return list(obj)
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def to_json(obj) -> bytes:
+    """
+    Serialize an object to JSON bytes.
+
+    Args:
+        obj: Object to serialize
+
+    Returns:
+        bytes: UTF-8 encoded JSON
+    """
+    if orjson is None:
+        return json.dumps(obj, default=_default, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+    return orjson.dumps(obj, default=_default, option=orjson.OPT_NON_STR_KEYS)
+
+
+def from_json(data):
+    """
+    Deserialize JSON from bytes or str.
+
+    Args:
+        data: JSON document
+
+    Returns:
+        The decoded object
+    """
+    if orjson is None:
+        return json.loads(data)
+    return orjson.loads(data)
+
+
+class OrjsonProvider(JSONProvider):
+    """Flask JSON provider that encodes and decodes with orjson."""
+
+    mimetype = 'application/json'
+
+    def dumps(self, obj, **kwargs) -> str:
+        """Serialize data as a JSON string."""
+        return to_json(obj).decode('utf-8')
+
+    def loads(self, s, **kwargs):
+        """Deserialize data from a JSON string or bytes."""
+        return from_json(s)
+
+    def response(self, *args, **kwargs):
+        """
+        Build a JSON response (used by jsonify).
+
+        Writes the encoded bytes straight into the response body,
+        skipping the intermediate str produced by dumps().
+        """
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(to_json(obj), mimetype=self.mimetype)
+
+
+def raw_json_response(body: bytes, status: int = 200):
+    """
+    Build a JSON response from an already encoded body.
+
+    Lets constant payloads be serialized once at import time while still
+    creating a fresh Response per request (after_request hooks such as
+    CORS mutate response headers, so Response objects cannot be shared).
+
+    Args:
+        body: Encoded JSON document
+        status: HTTP status code
+
+    Returns:
+        Response: JSON response
+    """
+    return current_app.response_class(body, status=status, mimetype='application/json')
+
+
+def _iter_list_json(key: str, items: list):
+    """Yield the JSON encoding of {"count": N, key: items} in chunks."""
+    buffer = [b'{"count":', str(len(items)).encode('ascii'), b',', to_json(key), b':[']
+    size = 0
+    for index, item in enumerate(items):
+        if index:
+            buffer.append(b',')
+        encoded = to_json(item)
+        buffer.append(encoded)
+        size += len(encoded)
+        if size >= _STREAM_CHUNK_SIZE:
+            yield b''.join(buffer)
+            buffer = []
+            size = 0
+    buffer.append(b']}')
+    yield b''.join(buffer)
+
+
+def stream_list_response(key: str, items: list):
+    """
+    Build a streamed JSON response for a list endpoint.
+
+    Records are encoded as the body is written instead of serializing
+    the whole payload into one string up front.
+
+    Args:
+        key: Name of the list field (e.g., 'claims')
+        items: Records to return
+
+    Returns:
+        Response: JSON response of the form {"count": N, key: [...]}
+    """
+    return current_app.response_class(_iter_list_json(key, items), mimetype='application/json')
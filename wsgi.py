@@ -0,0 +1,18 @@
+"""
+WSGI entry point for running the API under gunicorn with gevent workers.
+
+Usage: gunicorn -c gunicorn.conf.py wsgi:app
+"""
+# Patch blocking sockets before anything imports them
+from gevent import monkey
+monkey.patch_all()
+
+from app import app  # noqa: E402
+
+# Validate configuration and open the Supabase connection at worker boot
+# instead of on the first request
+from config import Config  # noqa: E402
+from services.supabase_client import SupabaseClient  # noqa: E402
+Config.validate()
+if not SupabaseClient.warm_up():
+    app.logger.warning('Supabase warm-up failed; connecting on first request instead')